@@ -0,0 +1,281 @@
+"""Answer a file of questions headlessly, several at a time.
+
+    python batch.py [questions.csv|questions.txt] [--out batch_output] [--concurrency 4] [--max-per-minute 30]
+
+Questions come from a CSV with a `question` column, a text file with one question
+per line, or config.SAMPLE_QUESTIONS when no file is given. Credentials are read
+from SNOWFLAKE_USER / SNOWFLAKE_PASSWORD (the password is prompted for if unset).
+`--offline` answers from the local stand-ins in benchmarks/ instead of Snowflake.
+
+The output directory gets answers.jsonl (one record per question), timings.csv
+(wall-clock milliseconds per stage), traces.jsonl and results/<n>.parquet for every
+structured answer.
+"""
+import argparse
+import contextvars
+import csv
+import getpass
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+import config
+import tracing
+from cortex_pipeline import CortexPipeline, build_summary_prompt, make_http_session
+from intent_router import COMPLETE, SEARCH, STRUCTURED, SUGGESTION, SUMMARIZE, IntentRouter
+from model_registry import ModelRegistry, stage_yaml_loader
+from result_cache import TTLCache
+from tracing import Tracer
+
+
+def stage_wall_times(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Wall-clock milliseconds per stage, from its first span's start to its last span's end.
+
+    Spans of one stage that overlapped (the concurrent passage summaries) count once,
+    so stages add up to no more than the question's total_ms.
+    """
+    bounds: Dict[str, List[float]] = {}
+    for span in spans:
+        end = span["start_ms"] + span["duration_ms"]
+        first, last = bounds.setdefault(span["name"], [span["start_ms"], end])
+        bounds[span["name"]] = [min(first, span["start_ms"]), max(last, end)]
+    return {name: round(last - first, 2) for name, (first, last) in bounds.items()}
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    if path is None:
+        return list(config.SAMPLE_QUESTIONS)
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return [row["question"].strip() for row in csv.DictReader(f) if row.get("question", "").strip()]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class RateLimiter:
+    """Spaces out calls to at most `per_minute` starts per minute, across threads."""
+
+    def __init__(self, per_minute: Optional[float]):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class BatchRunner:
+    """Answers questions concurrently with the same paths as the chat UI.
+
+    `session_provider` returns the current Snowpark session; it is read again after
+    `refresh_token` reconnects, so pipelines never keep using a closed session.
+    """
+
+    def __init__(self, session_provider: Callable[[], Any], token_provider, out_dir: str,
+                 concurrency: int = config.BATCH_CONCURRENCY,
+                 max_per_minute: Optional[float] = config.BATCH_MAX_PER_MINUTE, base_url: str = f"https://{config.HOST}",
+                 registry: Optional[ModelRegistry] = None, refresh_token=None):
+        self.session_provider = session_provider
+        self.token_provider = token_provider
+        self.refresh_token = refresh_token
+        self.out_dir = out_dir
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(max_per_minute)
+        self.base_url = base_url
+        self.registry = registry
+        self.router = IntentRouter()
+        self.http = make_http_session(base_url, pool_size=max(config.HTTP_POOL_SIZE, concurrency))
+        self.sql_cache = TTLCache(config.SQL_CACHE_TTL, config.SQL_CACHE_MAX_BYTES)
+        self.llm_cache = TTLCache(config.LLM_CACHE_TTL, config.LLM_CACHE_MAX_BYTES)
+        self.tracer = Tracer(os.path.join(out_dir, "traces.jsonl"))
+        self._summary_pool = ThreadPoolExecutor(max_workers=concurrency * config.SEARCH_SUMMARY_PASSAGES,
+                                                thread_name_prefix="batch-summary")
+
+    def submit(self, fn, *args) -> Future:
+        context = contextvars.copy_context()  # carries the question's trace into the worker
+        return self._summary_pool.submit(context.run, fn, *args)
+
+    def pipeline(self, errors: List[str]) -> CortexPipeline:
+        """A pipeline sharing this run's HTTP pool, caches and workers that reports into `errors`."""
+        def refresh_token(expired_token: str) -> bool:
+            renewed = self.refresh_token(expired_token)
+            pipeline.session = self.session_provider()
+            return renewed
+
+        pipeline = CortexPipeline(
+            self.session_provider(),
+            token_provider=self.token_provider,
+            http=self.http,
+            base_url=self.base_url,
+            refresh_token=refresh_token if self.refresh_token is not None else None,
+            sql_cache=self.sql_cache,
+            llm_cache=self.llm_cache,
+            on_error=errors.append,
+            on_warning=errors.append,
+            submit=self.submit,
+            registry=self.registry,
+        )
+        return pipeline
+
+    def run(self, questions: List[str]) -> List[Dict[str, Any]]:
+        os.makedirs(os.path.join(self.out_dir, "results"), exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            records = list(pool.map(self.answer, range(1, len(questions) + 1), questions))
+        self._summary_pool.shutdown()
+        self.write(records)
+        return records
+
+    def answer(self, index: int, question: str) -> Dict[str, Any]:
+        self.rate_limiter.wait()
+        errors: List[str] = []
+        pipeline = self.pipeline(errors)
+        record: Dict[str, Any] = {"index": index, "question": question}
+        start = time.perf_counter()
+        trace = self.tracer.start_trace(question)
+        try:
+            with trace.activate():
+                with tracing.span("intent") as attrs:
+                    intent = self.router.classify(question)
+                    attrs["intent"] = intent.intent
+                record["intent"] = intent.intent
+                if intent.intent in (STRUCTURED, SEARCH) and self.registry is not None:
+                    record["semantic_model"] = self.registry.route(question).entry.name
+                record.update(self._answer(pipeline, index, question, intent.intent))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        record["errors"] = errors
+        record["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        record["timings"] = stage_wall_times(trace.spans)
+        return record
+
+    def _answer(self, pipeline: CortexPipeline, index: int, question: str, intent: str) -> Dict[str, Any]:
+        if intent == SUGGESTION:
+            return {"answer": "\n".join(config.SAMPLE_QUESTIONS)}
+        if intent == COMPLETE:
+            with tracing.span("llm_complete"):
+                return {"answer": pipeline.complete(question)}
+        if intent == SUMMARIZE:
+            with tracing.span("llm_summary"):
+                return {"answer": pipeline.summarize(question)}
+        if intent == STRUCTURED:
+            sql = pipeline.generate_sql(question)
+            if not sql:
+                return {"answer": None}
+            results = self._fetch_all(pipeline, sql)
+            if results is None:
+                return {"answer": None, "sql": sql, "rows": 0}
+            results_file = os.path.join("results", f"{index:04d}.parquet")
+            results.to_parquet(os.path.join(self.out_dir, results_file), index=False)
+            prompt, _ = build_summary_prompt(question, results)
+            with tracing.span("llm_summary"):
+                summary = pipeline.complete(prompt)
+            return {"answer": summary, "sql": sql, "rows": len(results), "results_file": results_file}
+        answer, passages = pipeline.search_answer(question)
+        return {"answer": answer, "passages": passages}
+
+    @staticmethod
+    def _fetch_all(pipeline: CortexPipeline, sql: str) -> Optional[pd.DataFrame]:
+        """Every page of a query's results, up to MAX_RESULT_ROWS."""
+        pages = []
+        page = pipeline.run_snowflake_query(sql)
+        while page is not None:
+            pages.append(page)
+            if not page.attrs.get("has_more"):
+                break
+            page = pipeline.run_snowflake_query(sql, offset=sum(len(p) for p in pages), query_id=page.attrs["query_id"])
+        if not pages:
+            return None
+        results = pd.concat(pages, ignore_index=True)
+        results.attrs.update(pages[-1].attrs)  # has_more is left set when MAX_RESULT_ROWS cut the results off
+        return results
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        with open(os.path.join(self.out_dir, "answers.jsonl"), "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+        stages = sorted({name for record in records for name in record["timings"]})
+        with open(os.path.join(self.out_dir, "timings.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["index", "question", "intent", "total_ms"] + [f"{name}_ms" for name in stages])
+            for record in records:
+                writer.writerow([record["index"], record["question"], record.get("intent"), record["total_ms"]]
+                                + [record["timings"].get(name, "") for name in stages])
+
+
+def connect(args):
+    """(session_provider, token_provider, refresh_token, registry, base_url, cleanup) for a live or offline run."""
+    if args.offline:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+        from fake_snowflake import FakeSession
+        from mock_cortex import MockCortexServer
+
+        server = MockCortexServer(first_byte_latency=0.05, event_delay=0.001).start()
+        session = FakeSession(query_latency=0.05, llm_latency=0.1)
+        registry = ModelRegistry.from_config(config.SEMANTIC_MODELS)
+        return lambda: session, lambda: "offline-token", None, registry, server.base_url, server.stop
+
+    from connection_manager import ConnectionManager
+
+    user = os.environ.get("SNOWFLAKE_USER") or input("Snowflake username: ")
+    password = os.environ.get("SNOWFLAKE_PASSWORD") or getpass.getpass("Password: ")
+    manager = ConnectionManager(dict(config.CONNECT_PARAMS, user=user, password=password),
+                                config.CONNECTION_CHECK_INTERVAL)
+    manager.connect()
+    registry = ModelRegistry.from_config(config.SEMANTIC_MODELS, load_yaml=stage_yaml_loader(manager.session))
+
+    refresh_lock = threading.Lock()
+
+    def refresh_token(expired_token: str) -> bool:
+        # Questions that hit the same expired token at once reconnect only once
+        with refresh_lock:
+            if manager.connection is not None and manager.connection.rest.token != expired_token:
+                return True
+            manager.ensure_alive(force=True)
+            return manager.connection.rest.token != expired_token
+
+    return (lambda: manager.session, lambda: manager.connection.rest.token, refresh_token, registry,
+            f"https://{config.HOST}", manager.close)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("questions", nargs="?", help="CSV with a question column, or one question per line")
+    parser.add_argument("--out", default="batch_output", help="output directory")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY, help="questions in flight at once")
+    parser.add_argument("--max-per-minute", type=float, default=config.BATCH_MAX_PER_MINUTE,
+                        help="cap on questions started per minute")
+    parser.add_argument("--offline", action="store_true", help="use the local mock agent and fake Snowflake session")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    session_provider, token_provider, refresh_token, registry, base_url, cleanup = connect(args)
+    try:
+        runner = BatchRunner(session_provider, token_provider, args.out, args.concurrency, args.max_per_minute,
+                             base_url=base_url, registry=registry, refresh_token=refresh_token)
+        start = time.perf_counter()
+        records = runner.run(questions)
+        wall = time.perf_counter() - start
+    finally:
+        cleanup()
+
+    failed = [r for r in records if r["errors"] or not r.get("answer")]
+    print(f"{len(records)} questions in {wall:.1f}s ({len(records) / wall:.2f}/s), {len(failed)} without an answer")
+    for record in failed:
+        print(f"  #{record['index']} {record['question']}: {'; '.join(record['errors']) or 'no answer'}")
+    print(f"Answers, SQL, results and timings written to {os.path.abspath(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
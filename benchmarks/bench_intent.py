@@ -0,0 +1,88 @@
+"""Throughput and accuracy of question intent routing over a labeled question set.
+
+Compares IntentRouter with the original four-function if/elif cascade.
+
+    python benchmarks/bench_intent.py [--questions benchmarks/intent_questions.csv] [--repeat 2000]
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import COMPLETE, SEARCH, STRUCTURED, SUGGESTION, SUMMARIZE, IntentRouter  # noqa: E402
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_questions.csv")
+
+
+def legacy_classify(query: str) -> str:
+    """The original cascade from history1.py: uncompiled patterns, query.lower() per check."""
+    structured_patterns = [
+        r'\b(county|number|where|group by|order by|completed units|sum|count|avg|max|min|least|highest|which)\b',
+        r'\b(total|how many|leads |profit|projects|jurisdiction|month|year|energy savings|kwh)\b'
+    ]
+    complete_patterns = [r'\b(generate|write|create|describe|explain)\b']
+    summarize_patterns = [r'\b(summarize|summary|condense)\b']
+    suggestion_patterns = [
+        r'\b(what|which|how)\b.*\b(questions|type of questions|queries)\b.*\b(ask|can i ask|pose)\b',
+        r'\b(give me|show me|list)\b.*\b(questions|examples|sample questions)\b'
+    ]
+    is_structured = any(re.search(p, query.lower()) for p in structured_patterns)
+    is_complete = any(re.search(p, query.lower()) for p in complete_patterns)
+    is_summarize = any(re.search(p, query.lower()) for p in summarize_patterns)
+    is_suggestion = any(re.search(p, query.lower()) for p in suggestion_patterns)
+    if is_suggestion:
+        return SUGGESTION
+    if is_complete:
+        return COMPLETE
+    if is_summarize:
+        return SUMMARIZE
+    if is_structured:
+        return STRUCTURED
+    return SEARCH
+
+
+def load_questions(path: str) -> List[Tuple[str, str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["question"], row["intent"]) for row in csv.DictReader(f)]
+
+
+def measure(name: str, classify: Callable[[str], str], labeled: List[Tuple[str, str]], repeat: int) -> None:
+    questions = [q for q, _ in labeled]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            classify(q)
+    elapsed = time.perf_counter() - start
+    total = repeat * len(questions)
+
+    predictions = [(classify(q), label, q) for q, label in labeled]
+    correct = sum(1 for predicted, label, _ in predictions if predicted == label)
+    print(f"{name}")
+    print(f"  throughput: {total / elapsed:,.0f} questions/s ({elapsed / total * 1e6:.1f} us/question)")
+    print(f"  accuracy:   {correct}/{len(labeled)} ({correct / len(labeled):.1%})")
+    confusion = Counter((label, predicted) for predicted, label, _ in predictions if predicted != label)
+    for (label, predicted), count in confusion.most_common():
+        print(f"    {label} -> {predicted}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="CSV with question,intent columns")
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the question set when timing")
+    args = parser.parse_args()
+
+    labeled = load_questions(args.questions)
+    router = IntentRouter()
+    print(f"{len(labeled)} labeled questions, {args.repeat} timing passes\n")
+    measure("legacy cascade", legacy_classify, labeled, args.repeat)
+    measure("IntentRouter", lambda q: router.classify(q).intent, labeled, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
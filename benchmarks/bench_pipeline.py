@@ -0,0 +1,176 @@
+"""Throughput, latency percentiles and memory of the question pipeline, fully offline.
+
+Runs CortexPipeline against the local mock agent (mock_cortex.py) and the fake
+Snowpark session (fake_snowflake.py) for the structured, search and completion paths.
+
+    python benchmarks/bench_pipeline.py [--iterations 50] [--concurrency 4] [--latency-ms 300] \
+        [--payload-kb 16] [--rows 1000] [--cache] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config  # noqa: E402
+from cortex_pipeline import CortexPipeline, build_summary_prompt, make_http_session  # noqa: E402
+from fake_snowflake import FakeSession  # noqa: E402
+from mock_cortex import MockCortexServer  # noqa: E402
+from result_cache import TTLCache  # noqa: E402
+from tracing import Tracer  # noqa: E402
+
+QUESTIONS = {
+    "structured": [
+        "Show total energy savings by county.",
+        "Which county has the highest kWh savings?",
+        "How many active projects are there",
+        "What is the average kWh savings",
+    ],
+    "search": [
+        "What is Eco Sustain Innovations?",
+        "What is Green Residences program?",
+        "Tell me about metered savings verification",
+    ],
+    "completion": [
+        "Describe the energy savings technologies used in Green Residences.",
+        "Write a short note explaining heat pump retrofits to tenants.",
+    ],
+}
+
+
+def structured_path(pipeline: CortexPipeline, question: str) -> None:
+    sql = pipeline.generate_sql(question)
+    results = pipeline.run_snowflake_query(sql)
+    if results is None:
+        raise RuntimeError("structured path returned no results")
+    prompt, _ = build_summary_prompt(question, results)
+    pipeline.complete(prompt)
+
+
+def search_path(pipeline: CortexPipeline, question: str) -> None:
+    _, passages = pipeline.search_answer(question)
+    if not passages:
+        raise RuntimeError("search path returned no results")
+
+
+def completion_path(pipeline: CortexPipeline, question: str) -> None:
+    pipeline.complete(question)
+
+
+PATHS: Dict[str, Callable[[CortexPipeline, str], None]] = {
+    "structured": structured_path,
+    "search": search_path,
+    "completion": completion_path,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def make_pipeline(base_url: str, session: FakeSession, use_cache: bool) -> CortexPipeline:
+    def raise_error(message: str) -> None:
+        raise RuntimeError(message)  # any reported error invalidates the run
+
+    return CortexPipeline(
+        session,
+        token_provider=lambda: "bench-token",
+        http=make_http_session(base_url),
+        base_url=base_url,
+        sql_cache=TTLCache(config.SQL_CACHE_TTL, config.SQL_CACHE_MAX_BYTES) if use_cache else None,
+        result_cache=TTLCache(config.RESULT_CACHE_TTL, config.RESULT_CACHE_MAX_BYTES) if use_cache else None,
+        llm_cache=TTLCache(config.LLM_CACHE_TTL, config.LLM_CACHE_MAX_BYTES) if use_cache else None,
+        on_error=raise_error,
+        on_warning=raise_error,
+    )
+
+
+def run_path(name: str, pipeline: CortexPipeline, iterations: int, concurrency: int) -> Dict:
+    fn = PATHS[name]
+    questions = QUESTIONS[name]
+    tracer = Tracer()
+
+    def one(i: int) -> float:
+        question = questions[i % len(questions)]
+        start = time.perf_counter()
+        with tracer.start_trace(question).activate():
+            fn(pipeline, question)
+        return time.perf_counter() - start
+
+    one(0)  # warm up the connection pool
+    tracer = Tracer()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        durations = sorted(pool.map(one, range(iterations)))
+    wall = time.perf_counter() - start
+    stages = tracer.percentiles()
+
+    # Peak Python allocations of single questions, measured separately since tracemalloc slows everything down
+    tracemalloc.start()
+    for i in range(min(iterations, 5)):
+        one(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "path": name,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "throughput": iterations / wall,
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "p99_ms": percentile(durations, 99) * 1000,
+        "peak_mib": peak / 2**20,
+        "stages": stages,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--iterations", type=int, default=50, help="questions per path")
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=300, help="agent time to first byte")
+    parser.add_argument("--event-delay-ms", type=float, default=5, help="agent delay between SSE events")
+    parser.add_argument("--payload-kb", type=float, default=16, help="approximate size of each agent stream")
+    parser.add_argument("--sql-latency-ms", type=float, default=200, help="fake warehouse query time")
+    parser.add_argument("--llm-latency-ms", type=float, default=500, help="fake COMPLETE / SUMMARIZE time")
+    parser.add_argument("--rows", type=int, default=1000, help="rows in every query result")
+    parser.add_argument("--cache", action="store_true", help="enable the SQL, result and LLM caches")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    session = FakeSession(args.rows, args.sql_latency_ms / 1000, args.llm_latency_ms / 1000)
+    server = MockCortexServer(
+        first_byte_latency=args.latency_ms / 1000, event_delay=args.event_delay_ms / 1000, payload_kb=args.payload_kb
+    )
+    results = []
+    with server:
+        pipeline = make_pipeline(server.base_url, session, args.cache)
+        print(f"mock agent at {server.base_url}: {args.latency_ms:.0f} ms first byte, {args.payload_kb:g} KiB streams; "
+              f"caches {'on' if args.cache else 'off'}\n")
+        print(f"{'path':<12}{'q/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MiB':>10}")
+        for name in args.paths:
+            result = run_path(name, pipeline, args.iterations, args.concurrency)
+            results.append(result)
+            print(f"{name:<12}{result['throughput']:>8.2f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+                  f"{result['p99_ms']:>10.1f}{result['peak_mib']:>10.2f}")
+            for stage, stats in result["stages"].items():
+                print(f"  {stage:<18} p50 {stats['p50']:>8.1f} ms  p95 {stats['p95']:>8.1f} ms  (n={stats['count']})")
+        print(f"\n{server.requests} agent requests over {server.connections} connections, "
+              f"{len(session.queries)} SQL statements")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Parse cost of recorded agent SSE responses: original line parser vs sse_parser.
+
+    python benchmarks/bench_sse.py [--recordings benchmarks/recordings/*.sse] [--repeat 200]
+
+Each variant parses the buffered body and extracts the SQL or search results the
+way the app does. The orjson variant is skipped when orjson is not installed.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sse_parser  # noqa: E402
+from cortex_pipeline import AGENT_EVENT_FILTERS, process_sse_response  # noqa: E402
+
+DEFAULT_RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings", "*.sse")
+
+
+def legacy_parse(body: bytes) -> List[dict]:
+    """The original parser: decode, split, json.loads every data line."""
+    events, current_event = [], {}
+    for line in body.decode("utf-8").strip().split("\n"):
+        if line.startswith("event:"):
+            current_event["event"] = line.split(":", 1)[1].strip()
+        elif line.startswith("data:"):
+            data_str = line.split(":", 1)[1].strip()
+            if data_str != "[DONE]":
+                current_event["data"] = json.loads(data_str)
+                events.append(current_event)
+                current_event = {}
+    return events
+
+
+def new_parse(body: bytes) -> List[dict]:
+    return sse_parser.parse_sse_response(body, **AGENT_EVENT_FILTERS)
+
+
+def is_structured(body: bytes) -> bool:
+    return b"cortex_analyst_text_to_sql" in body
+
+
+def measure(name: str, parse: Callable[[bytes], List[dict]], bodies: List[Tuple[str, bytes]], repeat: int) -> None:
+    print(name)
+    for path, body in bodies:
+        structured = is_structured(body)
+        expected = process_sse_response(legacy_parse(body), structured)
+        got = process_sse_response(parse(body), structured)
+        if got != expected:
+            raise AssertionError(f"{name} extracted different results from {path}")
+        start = time.perf_counter()
+        for _ in range(repeat):
+            process_sse_response(parse(body), structured)
+        per_call = (time.perf_counter() - start) / repeat
+        print(f"  {os.path.basename(path):<20} {len(body) / 1024:>7.1f} KiB  {per_call * 1000:>7.3f} ms/response"
+              f"  {len(body) / per_call / 2**20:>8.1f} MiB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="glob of recorded SSE bodies")
+    parser.add_argument("--repeat", type=int, default=200, help="parses per recording when timing")
+    args = parser.parse_args()
+
+    bodies = []
+    for path in sorted(glob.glob(args.recordings)):
+        with open(path, "rb") as f:
+            bodies.append((path, f.read()))
+    if not bodies:
+        parser.error(f"no recordings match {args.recordings}")
+
+    measure("legacy parser (json, every event decoded)", legacy_parse, bodies, args.repeat)
+    backend = sse_parser._loads
+    try:
+        sse_parser._loads = json.loads
+        measure("sse_parser (json, tool results only)", new_parse, bodies, args.repeat)
+    finally:
+        sse_parser._loads = backend
+    if sse_parser.JSON_BACKEND == "orjson":
+        measure("sse_parser (orjson, tool results only)", new_parse, bodies, args.repeat)
+    else:
+        print("sse_parser (orjson): skipped, orjson is not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Import and render time of the Streamlit entry point's login page, cold and on rerun.
+
+Each sample runs in a fresh interpreter with Streamlit already imported, so only the
+app's own imports and setup are timed. `--baseline REV` runs the same measurement
+on a git revision of the repository for comparison.
+
+    python benchmarks/bench_startup.py [--app history1.py] [--samples 5] [--reruns 20] [--baseline HEAD~1]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "plotly.express", "pyarrow", "requests", "snowflake.connector", "snowflake.snowpark"]
+
+# Runs in the child interpreter: argv = app path, reruns
+PROBE = """
+import json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+heavy = {heavy!r}
+preloaded = {{m for m in heavy if m in sys.modules}}
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+if at.exception:
+    raise SystemExit(str(at.exception))
+reruns = []
+for _ in range(int(sys.argv[2])):
+    start = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({{"cold": cold, "reruns": reruns, "loaded": [m for m in heavy if m in sys.modules and m not in preloaded]}}))
+"""
+
+
+def measure(app_dir: str, app: str, reruns: int) -> Dict:
+    env = dict(os.environ, PYTHONPATH=app_dir)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES), os.path.join(app_dir, app), str(reruns)],
+        cwd=app_dir, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(label: str, app_dir: str, app: str, samples: int, reruns: int) -> None:
+    results = [measure(app_dir, app, reruns) for _ in range(samples)]
+    cold = statistics.median(r["cold"] for r in results) * 1000
+    rerun = statistics.median(t for r in results for t in r["reruns"]) * 1000
+    print(f"{label}")
+    print(f"  cold login page:  {cold:8.1f} ms (median of {samples})")
+    print(f"  rerun login page: {rerun:8.1f} ms (median of {samples * reruns})")
+    print(f"  heavy modules imported: {', '.join(results[0]['loaded']) or 'none'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="history1.py", help="entry point, relative to the repository root")
+    parser.add_argument("--samples", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns timed in each interpreter")
+    parser.add_argument("--baseline", help="git revision to measure as well, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    if args.baseline:
+        with tempfile.TemporaryDirectory(prefix="bench_startup_") as baseline_dir:
+            archive = subprocess.run(["git", "archive", args.baseline], cwd=ROOT, capture_output=True, check=True)
+            subprocess.run(["tar", "-x", "-C", baseline_dir], input=archive.stdout, check=True)
+            report(f"{args.baseline}", baseline_dir, args.app, args.samples, args.reruns)
+    report("working tree", ROOT, args.app, args.samples, args.reruns)
+
+
+if __name__ == "__main__":
+    main()
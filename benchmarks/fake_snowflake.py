@@ -0,0 +1,143 @@
+"""In-process stand-in for a Snowpark session, with configurable query and LLM latency.
+
+Covers the surface CortexPipeline uses, all through session.connection: cursor()
+execute / fetchone for the Cortex functions, execute_async / get_results_from_sfqid /
+fetch_pandas_batches / abort_query for result queries, and query status polling.
+Parameters are bound like the connector's `paramstyle`, taken from
+config.CONNECT_PARAMS: "qmark" and "numeric" bind on the server, anything else
+is %-formatted into the statement on the client, so "?" placeholders fail the
+way they do against Snowflake.
+"""
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+
+COUNTIES = ["Alameda", "Contra Costa", "Marin", "Napa", "San Francisco", "San Mateo", "Santa Clara", "Solano", "Sonoma"]
+BATCH_ROWS = 512  # rows per fetch_pandas_batches() batch, standing in for a result chunk
+
+
+def make_result_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Deterministic table shaped like the Green Residences results."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "COUNTY": [COUNTIES[i % len(COUNTIES)] for i in range(rows)],
+        "MONTH": pd.date_range("2020-01-01", periods=rows, freq="D"),
+        "KWH_SAVINGS": rng.gamma(2.0, 1500.0, rows).round(2),
+        "PROJECTS": rng.integers(1, 40, rows),
+    })
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+        self._row: Optional[Tuple[Any, ...]] = None
+
+    def execute(self, query: str, params: Optional[List[Any]] = None) -> "FakeCursor":
+        session = self._connection.session
+        params = params or []
+        if params and self._connection.paramstyle not in ("qmark", "numeric"):
+            query = query % tuple(params)  # client-side binding, as the connector does for pyformat / format
+        with session._lock:
+            session.queries.append(query)
+        upper = query.upper()
+        if "CORTEX.COMPLETE" in upper:
+            time.sleep(session.llm_latency)
+            self._row = (session.complete_response(params[-1]),)
+        elif "CORTEX.SUMMARIZE" in upper:
+            time.sleep(session.llm_latency)
+            self._row = (session.summarize_response(params[-1]),)
+        else:
+            time.sleep(session.query_latency)
+            self._row = tuple(session.result_frame.iloc[0])
+        return self
+
+    def fetchone(self) -> Optional[Tuple[Any, ...]]:
+        return self._row
+
+    def execute_async(self, query: str) -> Dict[str, Any]:
+        return {"queryId": self._connection.start(query)}
+
+    def get_results_from_sfqid(self, query_id: str) -> None:
+        remaining = self._connection.done_at(query_id) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def fetch_pandas_batches(self) -> Iterator[pd.DataFrame]:
+        frame = self._connection.session.result_frame
+        for start in range(0, len(frame), BATCH_ROWS):
+            yield frame.iloc[start:start + BATCH_ROWS].reset_index(drop=True)
+
+    def abort_query(self, query_id: str) -> bool:
+        self._connection.session.cancelled.append(query_id)
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    """Tracks async queries, each finishing `query_latency` seconds after it was started."""
+
+    def __init__(self, session: "FakeSession", user: str = "BENCH_USER", role: str = "ANALYST",
+                 paramstyle: str = config.CONNECT_PARAMS.get("paramstyle", "pyformat")):
+        self.session = session
+        self.user = user
+        self.role = role
+        self.paramstyle = paramstyle
+        self._done_at: Dict[str, float] = {}
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self)
+
+    def start(self, query: str) -> str:
+        query_id = self.session.next_query_id()
+        with self.session._lock:
+            self.session.queries.append(query)
+            self._done_at[query_id] = time.monotonic() + self.session.query_latency
+        return query_id
+
+    def done_at(self, query_id: str) -> float:
+        return self._done_at[query_id]
+
+    def get_query_status_throw_if_error(self, query_id: str) -> str:
+        if query_id in self.session.cancelled:
+            raise RuntimeError(f"Query {query_id} was cancelled")
+        return "RUNNING" if time.monotonic() < self.done_at(query_id) else "SUCCESS"
+
+    @staticmethod
+    def is_still_running(status: str) -> bool:
+        return status == "RUNNING"
+
+
+class FakeSession:
+    """Answers every SQL statement with the same table; latencies are in seconds."""
+
+    def __init__(self, rows: int = 1000, query_latency: float = 0.2, llm_latency: float = 0.5):
+        self.result_frame = make_result_frame(rows)
+        self.query_latency = query_latency
+        self.llm_latency = llm_latency
+        self.queries: List[str] = []
+        self.cancelled: List[str] = []
+        self.connection = FakeConnection(self)
+        self._lock = threading.Lock()
+        self._query_count = 0
+
+    def next_query_id(self) -> str:
+        with self._lock:
+            self._query_count += 1
+            return f"fake-{self._query_count:08d}"
+
+    def complete_response(self, prompt: str) -> str:
+        return f"Santa Clara has the highest total kWh savings across {len(self.result_frame)} records. ({len(prompt)} prompt chars)"
+
+    def summarize_response(self, text: str) -> str:
+        first = text.split(". ")[0].strip().rstrip(".")
+        return f"{first}. The program reports measurable energy savings."
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,198 @@
+"""Local stand-in for the Cortex Agent endpoint that replays SSE streams.
+
+    python benchmarks/mock_cortex.py [--port 8765] [--first-byte-ms 300] [--event-delay-ms 5] [--payload-kb 16]
+
+Analyst requests (a cortex_analyst_text_to_sql tool) get a stream carrying a SQL tool
+result and search requests one carrying search results, each padded with text deltas
+before and after the tool result up to the requested payload size. A recorded stream
+(raw SSE text, events separated by blank lines) can be replayed instead.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_SQL = (
+    "SELECT county, SUM(kwh_savings) AS total_kwh_savings FROM green_residences "
+    "GROUP BY county ORDER BY total_kwh_savings DESC"
+)
+DEFAULT_PASSAGES = [
+    "Green Residences is a multifamily retrofit program. It funds heat pumps, insulation and LED lighting. "
+    "Participating buildings report lower energy bills and fewer maintenance calls.",
+    "Eco Sustain Innovations installs solar water heating in affordable housing. "
+    "Projects are tracked by county and completion date.",
+    "Energy savings are verified twelve months after installation using metered kWh data.",
+]
+FILLER = "The agent is reasoning about the question and the available tools. "
+
+
+def sse_event(event: str, data) -> bytes:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n".encode("utf-8")
+
+
+def text_delta(text: str) -> bytes:
+    return sse_event("message.delta", {"delta": {"content": [{"type": "text", "text": text}]}})
+
+
+def build_sse_stream(is_structured: bool, payload_kb: float = 16, sql: str = DEFAULT_SQL,
+                     passages: Optional[List[str]] = None) -> List[bytes]:
+    """Events of a synthetic agent response, about `payload_kb` KiB in total."""
+    if is_structured:
+        result = {"type": "json", "json": {"sql": sql, "text": "Total kWh savings by county."}}
+    else:
+        texts = passages if passages is not None else DEFAULT_PASSAGES
+        result = {"type": "json", "json": {"searchResults": [{"text": t, "doc_id": i} for i, t in enumerate(texts)]}}
+    tool_event = sse_event("message.delta", {"delta": {"content": [
+        {"type": "tool_results", "tool_results": {"content": [result]}}
+    ]}})
+
+    chunk = FILLER * 4
+    padding_events = max(0, int(payload_kb * 1024 - len(tool_event)) // len(text_delta(chunk)))
+    before = padding_events // 2
+    events = [text_delta(chunk) for _ in range(before)]
+    events.append(tool_event)
+    # The real agent keeps streaming its answer after the tool result
+    events.extend(text_delta(chunk) for _ in range(padding_events - before))
+    events.append(sse_event("done", "[DONE]"))
+    return events
+
+
+def load_recording(path: str) -> List[bytes]:
+    """Split a recorded SSE body into events (blank-line separated)."""
+    with open(path, encoding="utf-8") as f:
+        body = f.read().replace("\r\n", "\n")
+    return [block.strip("\n").encode("utf-8") + b"\n\n" for block in body.split("\n\n") if block.strip()]
+
+
+class MockCortexServer:
+    """Threaded HTTP/1.1 server answering POSTs to the agent endpoint with chunked SSE.
+
+    `first_byte_latency` and `event_delay` are in seconds. Requests without an
+    Authorization header get a 401, like the real endpoint. `requests` and
+    `connections` count requests and accepted TCP connections, so keep-alive
+    reuse shows as requests > connections.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, first_byte_latency: float = 0.3,
+                 event_delay: float = 0.005, payload_kb: float = 16,
+                 structured_events: Optional[List[bytes]] = None, search_events: Optional[List[bytes]] = None):
+        self.first_byte_latency = first_byte_latency
+        self.event_delay = event_delay
+        self.streams: Dict[bool, List[bytes]] = {
+            True: structured_events or build_sse_stream(True, payload_kb),
+            False: search_events or build_sse_stream(False, payload_kb),
+        }
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockCortexServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-cortex", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockCortexServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with server._lock:
+                    server.requests += 1
+                if not self.headers.get("Authorization"):
+                    self._send_plain(401, b"Missing token")
+                    return
+                try:
+                    payload = json.loads(body)
+                    tool_type = payload["tools"][0]["tool_spec"]["type"]
+                except (ValueError, KeyError, IndexError):
+                    self._send_plain(400, b"Malformed agent request")
+                    return
+                events = server.streams[tool_type == "cortex_analyst_text_to_sql"]
+
+                time.sleep(server.first_byte_latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for i, event in enumerate(events):
+                        if i and server.event_delay:
+                            time.sleep(server.event_delay)
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # The client stopped reading early
+
+            def _send_plain(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-byte-ms", type=float, default=300, help="delay before the response headers")
+    parser.add_argument("--event-delay-ms", type=float, default=5, help="delay between SSE events")
+    parser.add_argument("--payload-kb", type=float, default=16, help="approximate size of each synthetic stream")
+    parser.add_argument("--structured-recording", help="SSE file replayed for analyst requests")
+    parser.add_argument("--search-recording", help="SSE file replayed for search requests")
+    args = parser.parse_args()
+
+    server = MockCortexServer(
+        args.host, args.port, args.first_byte_ms / 1000, args.event_delay_ms / 1000, args.payload_kb,
+        structured_events=load_recording(args.structured_recording) if args.structured_recording else None,
+        search_events=load_recording(args.search_recording) if args.search_recording else None,
+    )
+    print(f"Mock Cortex Agent listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Shrinking large result sets before they are handed to Plotly."""
+import hashlib
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+OTHER_LABEL = "Other"
+
+
+class ChartData(NamedTuple):
+    df: pd.DataFrame
+    note: Optional[str]  # what was done to the data, for the chart title
+    binned: bool  # row counts were computed here, plot the "count" column
+
+
+def result_hash(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame, used as a figure cache key."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    digest.update("\x00".join(map(str, df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _as_float(series: pd.Series) -> Optional[np.ndarray]:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.astype("int64").to_numpy(dtype=float)
+    try:
+        return series.astype(float).to_numpy()
+    except (TypeError, ValueError):
+        return None
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the line's shape."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def top_n_with_other(df: pd.DataFrame, x_col: str, y_col: str, top_n: int) -> pd.DataFrame:
+    """Sum y per x value and fold everything past the top_n largest into an "Other" row.
+
+    When y is not numeric, rows are counted per x value instead, in a "count" column.
+    """
+    values = _as_float(df[y_col])
+    if values is None:
+        y_col = "count"
+        totals = df[x_col].astype(str).value_counts()
+    else:
+        totals = pd.Series(values, index=df[x_col].astype(str)).groupby(level=0).sum().sort_values(ascending=False)
+    top = totals.head(top_n)
+    rest = totals.iloc[top_n:]
+    if len(rest):
+        top = pd.concat([top, pd.Series({OTHER_LABEL: rest.sum()})])
+    return pd.DataFrame({x_col: top.index, y_col: top.to_numpy()})
+
+
+def prepare_chart_data(
+    df: pd.DataFrame, x_col: str, y_col: str, chart_type: str,
+    max_points: int, top_n: int, histogram_bins: int,
+) -> ChartData:
+    """Reduce df to at most about max_points marks for the given chart type."""
+    n = len(df)
+    if n <= max_points:
+        return ChartData(df, None, False)
+
+    if chart_type == "Line Chart":
+        x = _as_float(df[x_col])
+        y = _as_float(df[y_col])
+        if x is None or y is None:
+            sampled = df.iloc[np.linspace(0, n - 1, max_points).astype(np.int64)]
+            return ChartData(sampled, f"every {n // max_points}th of {n:,} points", False)
+        order = np.argsort(x, kind="stable")
+        keep = ~np.isnan(y[order])
+        order = order[keep]
+        picked = order[lttb_indices(x[order], y[order], max_points)]
+        return ChartData(df.iloc[picked], f"{len(picked):,} of {n:,} points, LTTB", False)
+
+    if chart_type in ("Bar Chart", "Pie Chart"):
+        grouped = top_n_with_other(df, x_col, y_col, top_n)
+        counted = y_col not in grouped.columns
+        note = f"top {top_n} values by row count of {n:,} rows" if counted else f"top {top_n} of {n:,} rows"
+        return ChartData(grouped, note, counted)
+
+    if chart_type == "Scatter Chart":
+        # Large scatters are drawn with WebGL, which copes with about ten times as many points
+        sampled = df.sample(n=max_points * 10, random_state=0) if n > max_points * 10 else df
+        note = f"random {len(sampled):,} of {n:,} points" if len(sampled) < n else None
+        return ChartData(sampled, note, False)
+
+    if chart_type == "Histogram Chart":
+        x = _as_float(df[x_col])
+        if x is None:
+            counts = df[x_col].astype(str).value_counts()
+            binned = pd.DataFrame({x_col: counts.index[:top_n], "count": counts.to_numpy()[:top_n]})
+            return ChartData(binned, f"top {top_n} values of {n:,} rows", True)
+        x = x[~np.isnan(x)]
+        counts, edges = np.histogram(x, bins=histogram_bins)
+        binned = pd.DataFrame({x_col: (edges[:-1] + edges[1:]) / 2, "count": counts})
+        return ChartData(binned, f"{n:,} rows in {histogram_bins} bins", True)
+
+    return ChartData(df, None, False)
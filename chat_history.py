@@ -0,0 +1,110 @@
+"""Bounded chat history that keeps only a few result DataFrames in memory."""
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class ChatHistory:
+    """Ordered list of chat messages with a cap on messages and on in-memory results.
+
+    Assistant messages may carry a `results` DataFrame. Only the
+    `max_results_in_memory` most recently used ones stay in memory; older ones
+    are written to Parquet in a private temp dir and read back on demand by
+    `load_results`. If a result can't be written it is dropped and only its SQL
+    is kept. Messages beyond `max_messages` are discarded oldest first.
+
+    Each message gets an `id` when appended (unless it already has one), which
+    stays the same as older messages are discarded; use it for widget keys.
+    """
+
+    def __init__(self, max_messages: int = 100, max_results_in_memory: int = 3):
+        self.max_messages = max_messages
+        self.max_results_in_memory = max_results_in_memory
+        self._messages: List[Dict] = []
+        # id(message) -> message for messages whose results are held in memory, oldest first
+        self._in_memory: "OrderedDict[int, Dict]" = OrderedDict()
+        self._spill_dir = tempfile.mkdtemp(prefix="cortex_history_")
+        # Remove spilled files when the session's history is garbage collected
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._messages)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def append(self, message: Dict) -> None:
+        message.setdefault("id", uuid.uuid4().hex)
+        self._messages.append(message)
+        if message.get("results") is not None:
+            self._mark_in_memory(message)
+        while len(self._messages) > self.max_messages:
+            self._discard(self._messages.pop(0))
+
+    def clear(self) -> None:
+        for message in self._messages:
+            self._discard(message)
+        self._messages = []
+        self._in_memory.clear()
+
+    def load_results(self, message: Dict) -> Optional["pd.DataFrame"]:
+        """Return a message's results, reading them back from disk if they were spilled."""
+        if message.get("results") is None:
+            path = message.get("results_path")
+            if not path or not os.path.exists(path):
+                return None
+            import pandas as pd  # only needed once results have been spilled
+
+            results = pd.read_parquet(path)
+            results.attrs.update(message.get("results_attrs", {}))  # has_more, query_id
+            message["results"] = results
+        self._mark_in_memory(message)
+        return message["results"]
+
+    def set_results(self, message: Dict, results: "pd.DataFrame") -> None:
+        """Replace a message's results (e.g. after loading another page)."""
+        self._remove_file(message)
+        message["results"] = results
+        self._mark_in_memory(message)
+
+    def _mark_in_memory(self, message: Dict) -> None:
+        self._in_memory[id(message)] = message
+        self._in_memory.move_to_end(id(message))
+        while len(self._in_memory) > self.max_results_in_memory:
+            _, oldest = self._in_memory.popitem(last=False)
+            self._spill(oldest)
+
+    def _spill(self, message: Dict) -> None:
+        results = message.get("results")
+        if results is None:
+            return
+        if not message.get("results_path"):
+            path = os.path.join(self._spill_dir, f"{uuid.uuid4().hex}.parquet")
+            try:
+                results.to_parquet(path, index=False)
+            except Exception:
+                path = None  # Keep just the SQL
+            message["results_path"] = path
+            message["results_attrs"] = dict(results.attrs)
+        message["results"] = None
+
+    def _discard(self, message: Dict) -> None:
+        self._in_memory.pop(id(message), None)
+        self._remove_file(message)
+        message["results"] = None
+
+    @staticmethod
+    def _remove_file(message: Dict) -> None:
+        path = message.pop("results_path", None)
+        if path and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,115 @@
+"""Snowflake / Cortex configuration shared by the Streamlit app and headless tools."""
+import os
+
+# Snowflake/Cortex Configuration
+ACCOUNT = "GNB14769"
+HOST = "GNB14769.snowflakecomputing.com"
+WAREHOUSE = "CORTEX_SEARCH_TUTORIAL_WH"
+ROLE = "DEV_BR_CORTEX_AI_ROLE"
+DATABASE = "CORTEX_SEARCH_TUTORIAL_DB"
+SCHEMA = "PUBLIC"
+# STAGE = "CC_STAGE"
+API_ENDPOINT = "/api/v2/cortex/agent:run"
+API_TIMEOUT = 50000  # in milliseconds
+LLM_MODEL = "mistral-large"
+STREAM_RESPONSES = True  # parse agent SSE events as they arrive instead of buffering the body
+HTTP_POOL_SIZE = 10  # keep-alive connections to HOST kept open per process
+# A stream abandoned once its tool result arrives is read to the end in the background, so its
+# connection goes back to the pool; a longer or slower remainder is dropped with its connection
+STREAM_DRAIN_MAX_BYTES = 1024 * 1024
+STREAM_DRAIN_TIMEOUT = 5  # in seconds
+HTTP_MAX_RETRIES = 3  # retries on 429/5xx responses
+HTTP_BACKOFF_FACTOR = 0.5  # in seconds, doubled on each retry
+CORTEX_SEARCH_SERVICES = "CORTEX_SEARCH_TUTORIAL_DB.PUBLIC.BAYREN2"
+# Cortex Search: passages retrieved per question; the top ones are summarized concurrently and merged
+SEARCH_MAX_RESULTS = 5
+SEARCH_SUMMARY_PASSAGES = 3
+SEARCH_DEDUPE_THRESHOLD = 0.8  # share of shared word 3-grams at which two passages count as duplicates
+CONNECTION_CHECK_INTERVAL = 300  # in seconds between keepalive checks of a connection
+CONNECTION_IDLE_TIMEOUT = 1800  # in seconds before an unused connection is closed
+
+# Connect parameters other than the user's credentials
+CONNECT_PARAMS = {
+    "account": ACCOUNT,
+    "host": HOST,
+    "port": 443,
+    "warehouse": WAREHOUSE,
+    "role": ROLE,
+    "database": DATABASE,
+    "schema": SCHEMA,
+    # Applied at login instead of separate ALTER SESSION round trips
+    "session_parameters": {"TIMEZONE": "UTC", "QUOTED_IDENTIFIERS_IGNORE_CASE": True},
+    "client_session_keep_alive": True,
+    # Server-side binding for the "?" placeholders in COMPLETE / SUMMARIZE / CANCEL_QUERY calls;
+    # a connection created by the connector (not Snowpark) would otherwise use pyformat
+    "paramstyle": "qmark",
+}
+
+# Single semantic model
+SEMANTIC_MODEL = '@"CORTEX_SEARCH_TUTORIAL_DB"."PUBLIC"."MULTIFAMILYSTAGE"/Green_Residences.yaml'
+
+# Semantic models and search services questions are routed between; the first one is the default.
+# Keywords are added to the table, column and synonym names read from each model's YAML.
+SEMANTIC_MODELS = [
+    {
+        "name": "Green Residences",
+        "semantic_model_file": SEMANTIC_MODEL,
+        "search_service": CORTEX_SEARCH_SERVICES,
+        "keywords": ["green residences", "eco sustain", "energy savings", "kwh", "county", "jurisdiction", "projects"],
+    },
+]
+
+# Shared caches: question -> generated SQL, and SQL -> result DataFrame
+SQL_CACHE_TTL = 3600  # in seconds
+SQL_CACHE_MAX_BYTES = 8 * 1024 * 1024
+RESULT_CACHE_TTL = 900  # in seconds
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Query results are fetched through Arrow one page at a time, up to a hard row cap
+RESULT_PAGE_SIZE = 1000
+MAX_RESULT_ROWS = 10000
+# Queries run as async Snowflake jobs; they are cancelled server-side on timeout or when abandoned
+QUERY_TIMEOUT = 120  # in seconds
+QUERY_POLL_INITIAL = 0.05  # in seconds; first status check, grown by half on each poll...
+QUERY_POLL_INTERVAL = 0.5  # ...up to this interval
+# Memoized CORTEX.COMPLETE / CORTEX.SUMMARIZE responses, keyed by a hash of the prompt
+LLM_CACHE_TTL = 3600  # in seconds
+LLM_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# The caches above are per process; behind them sits a store shared by other processes:
+# "sqlite" (a file on a local disk, shared by the processes of this host only; WAL mode is unsafe
+# on NFS and other network filesystems), "redis" (needs the redis package; use it when replicas run
+# on several hosts) or "memory" (none). A store that can't be opened falls back to "memory".
+SHARED_CACHE_BACKEND = os.environ.get("CORTEX_CACHE_BACKEND", "sqlite")
+# Cached rows are readable by whoever can read the file: it is created owner-only (0600), and the
+# default directory is private to the user running the app
+SHARED_CACHE_SQLITE_PATH = os.environ.get(
+    "CORTEX_CACHE_PATH",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cortex_assistant", "cache.sqlite3"),
+)
+SHARED_CACHE_SQLITE_MAX_BYTES = 1024 * 1024 * 1024
+SHARED_CACHE_REDIS_URL = os.environ.get("CORTEX_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Bump to invalidate every shared entry after a change in how SQL, results or summaries are produced
+CACHE_VERSION = 2
+# Users who may purge the shared cache, e.g. CORTEX_CACHE_ADMINS="alice,bob"; nobody when empty
+CACHE_ADMINS = {user.strip().upper() for user in os.environ.get("CORTEX_CACHE_ADMINS", "").split(",") if user.strip()}
+
+# Offered in the sidebar, and the default question set of batch.py
+SAMPLE_QUESTIONS = [
+    "What is Eco Sustain Innovations?",
+    "What is Green Residences program?",
+    "Describe the energy savings technologies used in Green Residences.",
+    "Show total energy savings by county.",
+    "Which county has the highest kWh savings?",
+    "How many active projects are there",
+    "What is the average kWh savings",
+    "Which counties has the min and max of kWh savings",
+    "Which counties has the least and highest of kWh savings"
+]
+
+# Batch runs: questions answered at once, and a cap on how many may start per minute (None for no cap)
+BATCH_CONCURRENCY = 4
+BATCH_MAX_PER_MINUTE = None
+
+# Upper bound on the text sent to CORTEX.COMPLETE / CORTEX.SUMMARIZE
+PROMPT_TOKEN_BUDGET = 8000
+# How rows are picked when a result set is too large for the summary prompt: "head" or "sample"
+RESULT_PROMPT_STRATEGY = "head"
@@ -0,0 +1,121 @@
+"""Shared Snowflake connections and Snowpark sessions with health checks and idle cleanup."""
+import hashlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+
+class ConnectionManager:
+    """One user's Snowflake connection and Snowpark session.
+
+    Session settings are passed as connect parameters, so no USE / ALTER SESSION
+    round trips are needed after login. `ensure_alive` checks the connection with
+    a cheap query at most every `check_interval` seconds and reconnects with the
+    stored credentials when the session is closed or has expired.
+    """
+
+    def __init__(self, connect_params: Dict[str, Any], check_interval: float = 300):
+        self.connect_params = connect_params
+        self.check_interval = check_interval
+        self.connection = None
+        self.session: Optional["Session"] = None
+        self.last_used = time.monotonic()
+        self._last_checked = 0.0
+        self._lock = threading.RLock()
+
+    def connect(self) -> None:
+        # Imported on first connect so the login page doesn't pay for them
+        import snowflake.connector
+        from snowflake.snowpark import Session
+
+        with self._lock:
+            self.close()
+            self.connection = snowflake.connector.connect(**self.connect_params)
+            self.session = Session.builder.configs({"connection": self.connection}).create()
+            self._last_checked = time.monotonic()
+
+    def ensure_alive(self, force: bool = False) -> bool:
+        """Make sure the connection is usable, reconnecting if needed. Returns True if it reconnected."""
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self.connection is None or self.connection.is_closed():
+                self.connect()
+                return True
+            if not force and time.monotonic() - self._last_checked < self.check_interval:
+                return False
+            try:
+                # The connector also renews an expired session token on this request
+                with self.connection.cursor() as cur:
+                    cur.execute("SELECT 1")
+                self._last_checked = time.monotonic()
+                return False
+            except Exception:
+                self.connect()
+                return True
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_used
+
+    def close(self) -> None:
+        with self._lock:
+            if self.session is not None:
+                try:
+                    self.session.close()
+                except Exception:
+                    pass
+            if self.connection is not None:
+                try:
+                    self.connection.close()
+                except Exception:
+                    pass
+            self.session = None
+            self.connection = None
+
+
+class ConnectionPool:
+    """Process-wide registry of ConnectionManagers, one per browser session.
+
+    A Snowpark session is not safe to use from two scripts at once, and one
+    tab's reconnect would close the session under another tab's running query,
+    so browser sessions never share a manager, even for the same user. Managers
+    whose connection has been idle longer than `idle_timeout` are closed and
+    dropped by `close_idle`; their browser session reconnects on its next acquire.
+    """
+
+    def __init__(self, base_params: Dict[str, Any], check_interval: float = 300, idle_timeout: float = 1800):
+        self.base_params = base_params
+        self.check_interval = check_interval
+        self.idle_timeout = idle_timeout
+        self._managers: Dict[Tuple[str, str, str], ConnectionManager] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, user: str, password: str, client_id: str) -> ConnectionManager:
+        """Return a live manager for this browser session and credentials, connecting if needed.
+
+        Raises the connector's error if the credentials are rejected.
+        """
+        key = (client_id, user.upper(), hashlib.sha256(password.encode("utf-8")).hexdigest())
+        with self._lock:
+            manager = self._managers.get(key)
+            if manager is None:
+                params = dict(self.base_params, user=user, password=password)
+                manager = ConnectionManager(params, check_interval=self.check_interval)
+        manager.ensure_alive()
+        with self._lock:
+            shared = self._managers.setdefault(key, manager)
+        if shared is not manager:  # A concurrent rerun of this browser session connected first
+            manager.close()
+        return shared
+
+    def close_idle(self) -> int:
+        """Close and forget connections idle for longer than idle_timeout. Returns how many were closed."""
+        with self._lock:
+            idle = {key: manager for key, manager in self._managers.items() if manager.idle_for() > self.idle_timeout}
+            for key in idle:
+                del self._managers[key]
+        for manager in idle.values():
+            manager.close()
+        return len(idle)
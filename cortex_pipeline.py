@@ -0,0 +1,553 @@
+"""Cortex Agent, SQL and LLM calls behind the assistant, independent of Streamlit.
+
+The Streamlit app, the benchmarks and any other headless caller share this code.
+Errors are reported through callbacks (the app passes st.error / st.warning) and
+logged by default, so nothing here needs a running Streamlit script.
+"""
+import contextvars
+import hashlib
+import logging
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+import tracing
+from model_registry import ModelRegistry
+from prompt_encoding import EncodedResults, encode_results, truncate_to_token_budget
+from result_cache import TTLCache
+from search_answers import dedupe_passages, merge_summaries, rank_passages
+from shared_cache import SharedCache
+from sse_parser import TOOL_RESULT_EVENTS, TOOL_RESULT_MARKER, iter_sse_events, parse_sse_response
+
+logger = logging.getLogger(__name__)
+
+# Only tool results are read from agent responses; other events are skipped undecoded
+AGENT_EVENT_FILTERS = {"event_types": TOOL_RESULT_EVENTS, "must_contain": TOOL_RESULT_MARKER}
+
+Reporter = Callable[[str], None]
+Cache = Union[TTLCache, SharedCache]
+
+
+def make_http_session(
+    base_url: str,
+    pool_size: int = config.HTTP_POOL_SIZE,
+    max_retries: int = config.HTTP_MAX_RETRIES,
+    backoff_factor: float = config.HTTP_BACKOFF_FACTOR,
+) -> requests.Session:
+    """Keep-alive HTTP session for the agent endpoint that retries 429/5xx with backoff."""
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    http = requests.Session()
+    http.mount(base_url, adapter)
+    http.headers.update({"Content-Type": "application/json"})
+    return http
+
+
+def normalize_question(query: str) -> str:
+    """Canonical form of a question used as a cache key."""
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip("?.! ")
+
+
+def llm_cache_key(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+def summarize_unstructured_answer(answer):
+    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|")\s', answer)
+    return "\n".join(f"• {sent.strip()}" for sent in sentences[:6])
+
+
+def build_summary_prompt(
+    question: str, results: pd.DataFrame,
+    token_budget: int = config.PROMPT_TOKEN_BUDGET, strategy: str = config.RESULT_PROMPT_STRATEGY,
+) -> Tuple[str, EncodedResults]:
+    """Prompt asking CORTEX.COMPLETE to answer a question from its query results."""
+    encoded = encode_results(results, token_budget, strategy, has_more=results.attrs.get("has_more", False))
+    prompt = f"Provide a concise natural language answer to the query '{question}' using the following data, avoiding phrases like 'Based on the query results':\n\n{encoded.text}"
+    return prompt, encoded
+
+
+_drain_queue: "queue.Queue[Tuple[Any, Iterator[bytes]]]" = queue.Queue(maxsize=config.HTTP_POOL_SIZE)
+_drain_workers: List[threading.Thread] = []
+_drain_lock = threading.Lock()
+
+
+def drain_response(response, remainder: Iterator[bytes], max_bytes: int = config.STREAM_DRAIN_MAX_BYTES,
+                   timeout: float = config.STREAM_DRAIN_TIMEOUT) -> None:
+    """Read and discard the rest of a streamed body, then close the response.
+
+    `remainder` is the iterator the body was being read through; it must not have
+    been closed, since closing it mid-body also closes the connection. A body read
+    to the end lets urllib3 put the connection back in the pool; one longer than
+    max_bytes, or still arriving after `timeout` seconds, is abandoned and its
+    connection closed. A timer closes the response at the deadline, so a stalled
+    read doesn't hold the worker until the socket times out.
+    """
+    deadline = time.monotonic() + timeout
+    watchdog = threading.Timer(timeout, response.close)
+    watchdog.daemon = True
+    watchdog.start()
+    try:
+        read = 0
+        for chunk in remainder:
+            read += len(chunk)
+            if read > max_bytes or time.monotonic() > deadline:
+                break
+    except Exception as e:
+        logger.debug("Discarding agent connection: %s", e)
+    finally:
+        watchdog.cancel()
+        response.close()
+
+
+def _drain_worker() -> None:
+    while True:
+        response, remainder = _drain_queue.get()
+        drain_response(response, remainder)
+
+
+def drain_in_background(response, remainder: Iterator[bytes]) -> None:
+    """drain_response() on a few daemon threads, so the caller doesn't wait for the agent to finish.
+
+    The threads never keep the process alive at exit. When every worker is busy and
+    the queue is full, the response is closed instead, giving up its connection.
+    """
+    with _drain_lock:
+        if not _drain_workers:
+            for i in range(config.HTTP_POOL_SIZE):
+                worker = threading.Thread(target=_drain_worker, name=f"sse-drain-{i}", daemon=True)
+                worker.start()
+                _drain_workers.append(worker)
+    try:
+        _drain_queue.put_nowait((response, remainder))
+    except queue.Full:
+        response.close()
+
+
+def process_sse_response(response, is_structured, on_error: Reporter = logger.error):
+    sql = ""
+    search_results = []
+    if not response:
+        return sql, search_results
+    try:
+        for event in response:
+            if event.get("event") != "message.delta" or "data" not in event:
+                continue
+            for item in event["data"].get("delta", {}).get("content", ()):
+                if item.get("type") != "tool_results":
+                    continue
+                for result in item.get("tool_results", {}).get("content", ()):
+                    if result.get("type") != "json":
+                        continue
+                    result_data = result.get("json", {})
+                    if is_structured and "sql" in result_data:
+                        sql = result_data.get("sql", "")
+                    elif not is_structured and "searchResults" in result_data:
+                        search_results = [sr["text"] for sr in result_data["searchResults"]]
+            # Stop reading the stream as soon as we have what we need
+            if (is_structured and sql) or (not is_structured and search_results):
+                break
+    except Exception as e:
+        on_error(f"❌ Error Processing Response: {str(e)}")
+    finally:
+        if hasattr(response, "close"):  # stop reading a stream; its remainder is drained in the background
+            response.close()
+    return sql.strip(), search_results
+
+
+class CortexPipeline:
+    """Agent calls, SQL execution and Cortex LLM functions for one Snowflake session.
+
+    `session` is a Snowpark session (or anything with the same `sql()` surface) and
+    `token_provider` returns its current REST token. `refresh_token(expired_token)`
+    is called on a 401 and should return True once a new token is available. The
+    caches are optional; without them every call goes to Snowflake. `submit(fn, *args)`
+    runs concurrent LLM calls and returns a Future; by default a private thread pool
+    sized for SEARCH_SUMMARY_PASSAGES is used. With a `registry`, each question is
+    routed to a semantic model and search service; otherwise `semantic_model` and
+    `search_service` are always used.
+    """
+
+    def __init__(
+        self,
+        session,
+        token_provider: Callable[[], str],
+        http: Optional[requests.Session] = None,
+        base_url: str = f"https://{config.HOST}",
+        refresh_token: Optional[Callable[[str], bool]] = None,
+        sql_cache: Optional[Cache] = None,
+        result_cache: Optional[Cache] = None,
+        llm_cache: Optional[Cache] = None,
+        on_error: Reporter = logger.error,
+        on_warning: Reporter = logger.warning,
+        on_debug: Optional[Reporter] = None,
+        pending_query_ids: Optional[set] = None,
+        submit: Optional[Callable[..., Future]] = None,
+        semantic_model: str = config.SEMANTIC_MODEL,
+        search_service: str = config.CORTEX_SEARCH_SERVICES,
+        registry: Optional[ModelRegistry] = None,
+        stream: bool = config.STREAM_RESPONSES,
+    ):
+        self.session = session
+        self.token_provider = token_provider
+        self.http = http if http is not None else make_http_session(base_url)
+        self.base_url = base_url
+        self.refresh_token = refresh_token
+        self.sql_cache = sql_cache
+        self.result_cache = result_cache
+        self.llm_cache = llm_cache
+        self.on_error = on_error
+        self.on_warning = on_warning
+        self.on_debug = on_debug
+        # Queries started but not yet collected; cancelled if the caller abandons them
+        self.pending_query_ids = pending_query_ids if pending_query_ids is not None else set()
+        self.semantic_model = semantic_model
+        self.search_service = search_service
+        self.registry = registry
+        self.stream = stream
+        self.submit = submit if submit is not None else self._submit
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.search_max_results = config.SEARCH_MAX_RESULTS
+        self.search_summary_passages = config.SEARCH_SUMMARY_PASSAGES
+        self.search_dedupe_threshold = config.SEARCH_DEDUPE_THRESHOLD
+        self.api_timeout = config.API_TIMEOUT // 1000
+        self.page_size = config.RESULT_PAGE_SIZE
+        self.max_rows = config.MAX_RESULT_ROWS
+        self.query_timeout = config.QUERY_TIMEOUT
+        self.query_poll_initial = config.QUERY_POLL_INITIAL
+        self.query_poll_interval = config.QUERY_POLL_INTERVAL
+        self.prompt_token_budget = config.PROMPT_TOKEN_BUDGET
+        self._auth_headers: Tuple[Optional[str], Dict[str, str]] = (None, {})
+
+    # Query execution
+
+    def run_snowflake_query(self, query, offset=0, progress: Optional[Callable[[str, float], None]] = None,
+                            query_id: Optional[str] = None):
+        """Fetch one page of query results starting at `offset`.
+
+        The query runs once; later pages pass the result_df.attrs["query_id"] of the
+        first page and are read from that same result set, so pages neither overlap
+        nor skip rows. Cached pages are keyed by the user and role too, so row access
+        policies still apply to results another user fetched. result_df.attrs["has_more"]
+        tells whether the result set goes on past this page; pages are only fetched up
+        to max_rows. `progress(query_id, elapsed)` is called while the query runs.
+        """
+        try:
+            if not query:
+                self.on_warning("⚠️ No SQL query generated.")
+                return None
+            cache_key = (*self.result_scope(), query if query_id is None else query_id, offset)
+            if self.result_cache is not None:
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            limit = min(self.page_size, self.max_rows - offset)
+            if limit <= 0:
+                return None
+            cursor = self.session.connection.cursor()
+            try:
+                if query_id is None:
+                    query_id = cursor.execute_async(query.strip().rstrip(";"))["queryId"]
+                    self.wait_for_query(query_id, progress)
+                # Fetch one extra row to learn whether there is another page
+                result_df = self.fetch_rows(cursor, query_id, offset, limit + 1)
+            finally:
+                cursor.close()
+            if result_df.empty:
+                return None
+            has_more = len(result_df) > limit
+            result_df = result_df.head(limit)
+            result_df.attrs["has_more"] = has_more
+            result_df.attrs["query_id"] = query_id
+            if self.result_cache is not None:
+                self.result_cache.set(cache_key, result_df)
+            return result_df
+        except Exception as e:
+            self.on_error(f"❌ SQL Execution Error: {str(e)}")
+            return None
+
+    def result_scope(self) -> Tuple[str, str]:
+        """(user, role) of the connection, which decide the rows a query can see."""
+        connection = self.session.connection
+        return str(connection.user).upper(), str(connection.role).upper()
+
+    def wait_for_query(self, query_id: str, progress: Optional[Callable[[str, float], None]] = None) -> None:
+        """Poll an async query until it finishes, raising if it failed.
+
+        The query is cancelled server-side if it runs past query_timeout or if the
+        caller is interrupted while waiting (e.g. a Streamlit rerun).
+        """
+        connection = self.session.connection
+        self.pending_query_ids.add(query_id)
+        start = time.monotonic()
+        delay = self.query_poll_initial  # short queries are picked up quickly, long ones polled less often
+        finished = False
+        try:
+            with tracing.span("sql_execution", query_id=query_id):
+                while connection.is_still_running(connection.get_query_status_throw_if_error(query_id)):
+                    elapsed = time.monotonic() - start
+                    if elapsed > self.query_timeout:
+                        raise TimeoutError(f"Query {query_id} cancelled after running for {self.query_timeout} seconds.")
+                    if progress is not None:
+                        progress(query_id, elapsed)
+                    time.sleep(delay)
+                    delay = min(delay * 1.5, self.query_poll_interval)
+            finished = True
+        finally:
+            self.pending_query_ids.discard(query_id)
+            if not finished:
+                self.cancel_query(query_id)
+
+    @staticmethod
+    def fetch_rows(cursor, query_id: str, offset: int, n: int) -> pd.DataFrame:
+        """Rows [offset, offset + n) of a finished query's result set, downloading only the batches needed."""
+        with tracing.span("dataframe_build", query_id=query_id) as attrs:
+            cursor.get_results_from_sfqid(query_id)
+            frames = []
+            remaining = n
+            for batch in cursor.fetch_pandas_batches():
+                if offset >= len(batch):
+                    offset -= len(batch)
+                    continue
+                frames.append(batch.iloc[offset:offset + remaining])
+                remaining -= len(frames[-1])
+                offset = 0
+                if remaining <= 0:
+                    break
+            result_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            attrs["rows"] = len(result_df)
+        return result_df
+
+    def cancel_query(self, query_id: str):
+        """Abort a running query; a failure is logged rather than raised."""
+        try:
+            cursor = self.session.connection.cursor()
+            try:
+                if not cursor.abort_query(query_id):
+                    logger.warning("Snowflake did not cancel query %s (it may have already finished)", query_id)
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.warning("Could not cancel query %s: %s", query_id, e)
+
+    def cancel_orphaned_queries(self):
+        """Cancel queries an interrupted caller started but never collected."""
+        while self.pending_query_ids:
+            self.cancel_query(self.pending_query_ids.pop())
+
+    # Cortex LLM functions
+
+    def complete(self, prompt, model=config.LLM_MODEL):
+        """CORTEX.COMPLETE, memoized on the model and prompt text."""
+        if self.llm_cache is None:
+            return self.cortex_complete(prompt, model)
+        key = llm_cache_key("complete", model, prompt)
+        return self.llm_cache.get_or_compute(key, lambda: self.cortex_complete(prompt, model))
+
+    def summarize(self, text):
+        """CORTEX.SUMMARIZE, memoized on the input text."""
+        text = truncate_to_token_budget(text, self.prompt_token_budget)
+        if self.llm_cache is None:
+            return self.cortex_summarize(text)
+        key = llm_cache_key("summarize", text)
+        return self.llm_cache.get_or_compute(key, lambda: self.cortex_summarize(text))
+
+    def cortex_complete(self, prompt, model=config.LLM_MODEL):
+        try:
+            # Bound parameters keep the statement text constant whatever the prompt contains
+            query = "SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS response"
+            return self.query_value(query, [model, prompt])
+        except Exception as e:
+            self.on_error(f"❌ COMPLETE Function Error: {str(e)}")
+            return None
+
+    def cortex_summarize(self, text):
+        try:
+            query = "SELECT SNOWFLAKE.CORTEX.SUMMARIZE(?) AS summary"
+            return self.query_value(query, [text])
+        except Exception as e:
+            self.on_error(f"❌ SUMMARIZE Function Error: {str(e)}")
+            return None
+
+    def query_value(self, query: str, params: List[Any]) -> Any:
+        """First column of the first row of a query, run on a cursor of its own.
+
+        Threads may share a connector connection but not a cursor, and Snowpark's
+        session.sql() reuses one cursor for every call, so concurrent LLM calls
+        (summarize_passages, the app's background summary) each open a cursor.
+        """
+        cursor = self.session.connection.cursor()
+        try:
+            return cursor.execute(query, params).fetchone()[0]
+        finally:
+            cursor.close()
+
+    def summarize_passages(self, passages: List[str]) -> List[Optional[str]]:
+        """summarize() each passage concurrently, returning summaries in passage order."""
+        futures = [self.submit(self._traced_summarize, passage) for passage in passages]
+        return [future.result() for future in futures]
+
+    def _traced_summarize(self, text):
+        with tracing.span("llm_summary"):
+            return self.summarize(text)
+
+    def _submit(self, fn, *args) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.search_summary_passages, thread_name_prefix="summarize")
+        context = contextvars.copy_context()  # carries the current trace into the worker
+        return self._executor.submit(context.run, fn, *args)
+
+    # Cortex Agent
+
+    def route(self, query: str) -> Tuple[str, str]:
+        """(semantic_model_file, search_service) to answer a question from."""
+        if self.registry is None:
+            return self.semantic_model, self.search_service
+        entry = self.registry.route(query).entry
+        return entry.semantic_model_file, entry.search_service
+
+    def generate_sql(self, query: str) -> str:
+        """Return the analyst SQL for a question, reusing a cached translation when available."""
+        semantic_model, _ = self.route(query)
+        # The model's content digest retires cached SQL once a re-uploaded model file is loaded
+        version = self.registry.version(semantic_model) if self.registry is not None else ""
+        key = (normalize_question(query), semantic_model, version)
+        sql = self.sql_cache.get(key) if self.sql_cache is not None else None
+        if sql is None:
+            response = self.snowflake_api_call(query, is_structured=True, semantic_model=semantic_model)
+            sql, _ = process_sse_response(response, is_structured=True, on_error=self.on_error)
+            if sql and self.sql_cache is not None:
+                self.sql_cache.set(key, sql)
+        return sql
+
+    def search(self, query: str) -> List[str]:
+        """Passages returned by the Cortex Search service for a question."""
+        _, search_service = self.route(query)
+        response = self.snowflake_api_call(query, is_structured=False, search_service=search_service)
+        _, search_results = process_sse_response(response, is_structured=False, on_error=self.on_error)
+        return search_results
+
+    def search_answer(self, query: str) -> Tuple[Optional[str], List[str]]:
+        """Answer from the top search passages, summarized concurrently and merged.
+
+        Returns the merged answer (None if no summary could be generated) and the
+        de-duplicated, ranked passages it was built from.
+        """
+        passages = dedupe_passages(self.search(query), self.search_dedupe_threshold)
+        passages = rank_passages(query, passages)[:self.search_summary_passages]
+        if not passages:
+            return None, []
+        return merge_summaries(self.summarize_passages(passages)), passages
+
+    def snowflake_api_call(self, query: str, is_structured: bool = False, stream: Optional[bool] = None,
+                           semantic_model: Optional[str] = None, search_service: Optional[str] = None):
+        payload = {
+            "model": config.LLM_MODEL,
+            "messages": [{"role": "user", "content": [{"type": "text", "text": query}]}],
+            "tools": []
+        }
+        if is_structured:
+            payload["tools"].append({"tool_spec": {"type": "cortex_analyst_text_to_sql", "name": "analyst1"}})
+            payload["tool_resources"] = {"analyst1": {"semantic_model_file": semantic_model or self.semantic_model}}
+        else:
+            payload["tools"].append({"tool_spec": {"type": "cortex_search", "name": "search1"}})
+            payload["tool_resources"] = {"search1": {"name": search_service or self.search_service, "max_results": self.search_max_results}}
+
+        debug = self.on_debug is not None
+        # Debug output needs the raw body, so it always reads the full response
+        stream = (self.stream if stream is None else stream) and not debug
+        try:
+            request_start = time.perf_counter()
+            with tracing.span("agent_http", stream=stream) as attrs:
+                resp = self.post_agent_request(payload, stream)
+                attrs["status"] = resp.status_code
+            if debug:
+                self.on_debug(f"API Response Status: {resp.status_code}")
+                self.on_debug(f"API Raw Response: {resp.text}")
+            if resp.status_code < 400:
+                if stream:
+                    return self.stream_sse_response(resp, request_start)
+                tracing.record("agent_first_event", time.perf_counter() - request_start, start=request_start)
+                if not resp.content.strip():
+                    self.on_error("❌ API returned an empty response.")
+                    return None
+                return parse_sse_response(resp.content, self.on_error, **AGENT_EVENT_FILTERS)
+            else:
+                raise Exception(f"Failed request with status {resp.status_code}: {resp.text}")
+        except Exception as e:
+            self.on_error(f"❌ API Request Failed: {str(e)}")
+            return None
+
+    def stream_sse_response(self, resp, request_start: float) -> Iterator[Dict]:
+        """Parse SSE events from a streaming response as they arrive.
+
+        If the caller stops early, the rest of the body is drained in the background
+        so the connection can be reused rather than closed.
+        """
+        received = False
+        finished = False
+        # Raw bytes: skipped events are never decoded to text or JSON. Held here so
+        # stopping early leaves it open for draining instead of closing the connection.
+        raw_lines = resp.iter_lines()
+
+        def lines() -> Iterator[bytes]:
+            nonlocal received
+            for line in raw_lines:
+                if not received:
+                    tracing.record("agent_first_event", time.perf_counter() - request_start, start=request_start)
+                    received = True
+                yield line
+
+        try:
+            yield from iter_sse_events(lines(), self.on_error, **AGENT_EVENT_FILTERS)
+            finished = True
+            if not received:
+                self.on_error("❌ API returned an empty response.")
+        finally:
+            if finished:
+                resp.close()
+            else:
+                drain_in_background(resp, raw_lines)
+
+    def auth_headers(self, token: str) -> Dict[str, str]:
+        """Return the Authorization header for a token, rebuilt only when the token changes."""
+        if self._auth_headers[0] != token:
+            self._auth_headers = (token, {"Authorization": f'Snowflake Token="{token}"'})
+        return self._auth_headers[1]
+
+    def post_agent_request(self, payload: Dict, stream: bool):
+        """POST to the agent endpoint over the pooled session, retrying once with a refreshed token on 401."""
+        token = self.token_provider()
+        resp = self.http.post(
+            url=f"{self.base_url}{config.API_ENDPOINT}",
+            json=payload,
+            headers=self.auth_headers(token),
+            timeout=self.api_timeout,
+            stream=stream
+        )
+        if resp.status_code == 401 and self.refresh_token is not None and self.refresh_token(token):
+            resp.close()
+            resp = self.http.post(
+                url=f"{self.base_url}{config.API_ENDPOINT}",
+                json=payload,
+                headers=self.auth_headers(self.token_provider()),
+                timeout=self.api_timeout,
+                stream=stream
+            )
+        return resp
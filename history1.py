@@ -1,24 +1,64 @@
 import streamlit as st
-import json
+import contextvars
+import os
 import re
-import requests
-import snowflake.connector
-import pandas as pd
-from snowflake.snowpark import Session
-from typing import Any, Dict, List, Optional, Tuple
-import plotly.express as px  # Added for interactive visualizations
-
-# Snowflake/Cortex Configuration
-HOST = "GNB14769.snowflakecomputing.com"
-DATABASE = "CORTEX_SEARCH_TUTORIAL_DB"
-SCHEMA = "PUBLIC"
-# STAGE = "CC_STAGE"
-API_ENDPOINT = "/api/v2/cortex/agent:run"
-API_TIMEOUT = 50000  # in milliseconds
-CORTEX_SEARCH_SERVICES = "CORTEX_SEARCH_TUTORIAL_DB.PUBLIC.BAYREN2"
-
-# Single semantic model
-SEMANTIC_MODEL = '@"CORTEX_SEARCH_TUTORIAL_DB"."PUBLIC"."MULTIFAMILYSTAGE"/Green_Residences.yaml'
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from typing import TYPE_CHECKING, Dict
+# pandas, plotly, requests and Snowflake are imported where first needed, so the login page loads without them
+from chat_history import ChatHistory
+from config import (
+    CACHE_ADMINS, CACHE_VERSION, CONNECT_PARAMS, CONNECTION_CHECK_INTERVAL, CONNECTION_IDLE_TIMEOUT, HOST,
+    LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL, MAX_RESULT_ROWS, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL, RESULT_PAGE_SIZE,
+    SAMPLE_QUESTIONS, SEARCH_SUMMARY_PASSAGES, SEMANTIC_MODELS, SHARED_CACHE_BACKEND, SHARED_CACHE_REDIS_URL,
+    SHARED_CACHE_SQLITE_MAX_BYTES, SHARED_CACHE_SQLITE_PATH, SQL_CACHE_MAX_BYTES, SQL_CACHE_TTL,
+)
+from connection_manager import ConnectionManager, ConnectionPool
+from model_registry import ModelRegistry, stage_yaml_loader
+from intent_router import COMPLETE, STRUCTURED, SUGGESTION, SUMMARIZE, IntentRouter, make_llm_fallback
+from result_cache import TTLCache
+from shared_cache import SharedCache, make_backend
+import tracing
+from tracing import Tracer
+
+if TYPE_CHECKING:
+    import requests
+
+# Snowflake, Cortex and cache settings shared with headless tools live in config.py
+
+# Chat history limits: older result DataFrames are spilled to Parquet in a temp dir
+HISTORY_MAX_MESSAGES = 100
+HISTORY_MAX_RESULTS_IN_MEMORY = 3
+
+# Charts: results with more rows than this are aggregated or downsampled before plotting
+CHART_MAX_POINTS = 5000
+CHART_TOP_N = 20  # bars / pie slices kept before folding the rest into "Other"
+CHART_HISTOGRAM_BINS = 50
+FIGURE_CACHE_ENTRIES = 64
+
+# Seconds between re-reads of the staged semantic model files
+MODEL_REFRESH_INTERVAL = 600
+
+# Ask CORTEX.COMPLETE to settle questions the keyword router finds ambiguous
+INTENT_LLM_FALLBACK = False
+
+# Per-question latency spans (including the question text) are appended to this JSON lines file.
+# It lives in a private per-user directory, is created 0600, and rolls over to <path>.1 at the size cap.
+TRACE_LOG_PATH = os.environ.get(
+    "CORTEX_TRACE_LOG",
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "cortex_assistant", "traces.jsonl"),
+)
+TRACE_LOG_MAX_BYTES = 50 * 1024 * 1024
+TRACE_WINDOW = 500  # recent durations per stage used for the sidebar percentiles
+
+# Render results and chart first and fill in the LLM summary from a background worker
+PARALLEL_SUMMARY = True
+# The pool is shared by every session in the process and a search question fans out one task per
+# passage, so it is sized for that many questions at once; further questions queue behind them
+SUMMARY_CONCURRENT_QUESTIONS = 8
+SUMMARY_WORKERS = SUMMARY_CONCURRENT_QUESTIONS * SEARCH_SUMMARY_PASSAGES
 
 # Streamlit Page Config
 st.set_page_config(
@@ -27,35 +67,28 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
-# Initialize session state
-if "authenticated" not in st.session_state:
-    st.session_state.authenticated = False
-    st.session_state.username = ""
-    st.session_state.password = ""
-    st.session_state.CONN = None
-    st.session_state.snowpark_session = None
-    st.session_state.chat_history = []  # Initialize chat history
-if "debug_mode" not in st.session_state:
-    st.session_state.debug_mode = False
-# Initialize chart selection persistence
-if "chart_x_axis" not in st.session_state:
-    st.session_state.chart_x_axis = None
-if "chart_y_axis" not in st.session_state:
-    st.session_state.chart_y_axis = None
-if "chart_type" not in st.session_state:
-    st.session_state.chart_type = "Bar Chart"
-# Initialize query and results persistence
-if "current_query" not in st.session_state:
-    st.session_state.current_query = None
-if "current_results" not in st.session_state:
-    st.session_state.current_results = None
-if "current_sql" not in st.session_state:
-    st.session_state.current_sql = None
-if "current_summary" not in st.session_state:
-    st.session_state.current_summary = None
+# Session defaults, set once per browser session rather than checked on every rerun
+SESSION_DEFAULTS = {
+    "authenticated": False,
+    "username": "",
+    "password": "",
+    "CONN": None,
+    "snowpark_session": None,
+    "debug_mode": False,
+    # Chart selection persistence
+    "chart_x_axis": None,
+    "chart_y_axis": None,
+    "chart_type": "Bar Chart",
+    # Query and results persistence
+    "current_query": None,
+    "current_results": None,
+    "current_sql": None,
+    "current_summary": None,
+}
 
-# Hide Streamlit branding and prevent chat history shading
-st.markdown("""
+# Hide Streamlit branding, prevent chat history shading and style the sidebar buttons.
+# Streamlit only keeps elements emitted by the current run, so this is sent on every run.
+APP_CSS = """
 <style>
 #MainMenu, header, footer {visibility: hidden;}
 /* Prevent shading of previous chat messages */
@@ -63,12 +96,97 @@ st.markdown("""
     opacity: 1 !important;
     background-color: transparent !important;
 }
+[data-testid="stSidebar"] [data-testid="stButton"] > button {
+    background-color: #29B5E8 !important;
+    color: white !important;
+    font-weight: bold !important;
+    width: 100% !important;
+    border-radius: 0px !important;
+    margin: 0 !important;
+    border: none !important;
+    padding: 0.5rem 1rem !important;
+}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+def init_session_state():
+    for key, value in SESSION_DEFAULTS.items():
+        if key not in st.session_state:
+            st.session_state[key] = value
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = ChatHistory(HISTORY_MAX_MESSAGES, HISTORY_MAX_RESULTS_IN_MEMORY)
+    st.session_state.session_initialized = True
+
+if "session_initialized" not in st.session_state:
+    init_session_state()
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# Pooled HTTP session shared by every user of this process
+@st.cache_resource
+def get_http_session() -> "requests.Session":
+    from cortex_pipeline import make_http_session
+
+    return make_http_session(f"https://{HOST}")
+
+# Snowflake connections of every browser session of this process
+@st.cache_resource
+def get_connection_pool() -> ConnectionPool:
+    return ConnectionPool(
+        CONNECT_PARAMS,
+        check_interval=CONNECTION_CHECK_INTERVAL,
+        idle_timeout=CONNECTION_IDLE_TIMEOUT,
+    )
+
+# Store shared by the app's processes (None for "memory", or when the store can't be opened)
+@st.cache_resource
+def get_cache_backend():
+    return make_backend(SHARED_CACHE_BACKEND, SHARED_CACHE_SQLITE_PATH, SHARED_CACHE_SQLITE_MAX_BYTES, SHARED_CACHE_REDIS_URL)
+
+def make_shared_cache(namespace: str, ttl: float, max_bytes: int) -> SharedCache:
+    # Generated SQL is also keyed by the content digest of its semantic model (see get_model_registry)
+    return SharedCache(get_cache_backend(), namespace, ttl, TTLCache(ttl=ttl, max_bytes=max_bytes),
+                       version=f"v{CACHE_VERSION}")
+
+# Caches shared by every session of this process, and through the backend by every process
+@st.cache_resource
+def get_sql_cache() -> SharedCache:
+    return make_shared_cache("sql", SQL_CACHE_TTL, SQL_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_result_cache() -> SharedCache:
+    return make_shared_cache("results", RESULT_CACHE_TTL, RESULT_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_llm_cache() -> SharedCache:
+    return make_shared_cache("llm", LLM_CACHE_TTL, LLM_CACHE_MAX_BYTES)
+
+# Worker pool for LLM summaries that run alongside result rendering
+@st.cache_resource
+def get_summary_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+# Semantic models are read from their stage by the first session that logs in, and again every
+# MODEL_REFRESH_INTERVAL so a re-uploaded model changes its digest and retires its cached SQL
+@st.cache_resource(ttl=MODEL_REFRESH_INTERVAL, show_spinner="Loading semantic models...")
+def get_model_registry(_session) -> ModelRegistry:
+    return ModelRegistry.from_config(SEMANTIC_MODELS, load_yaml=stage_yaml_loader(_session))
+
+@st.cache_resource
+def get_tracer() -> Tracer:
+    return Tracer(TRACE_LOG_PATH, window=TRACE_WINDOW, max_bytes=TRACE_LOG_MAX_BYTES)
+
+QUERY_CACHES = {"Generated SQL": get_sql_cache, "Query results": get_result_cache, "LLM responses": get_llm_cache}
+
+def clear_query_caches(names=tuple(QUERY_CACHES)) -> int:
+    """Purge caches for every app process. Returns the number of shared entries removed."""
+    return sum(QUERY_CACHES[name]().clear() for name in names)
+
+def is_cache_admin() -> bool:
+    return st.session_state.username.upper() in CACHE_ADMINS
 
 # Function to start a new conversation
 def start_new_conversation():
-    st.session_state.chat_history = []
+    st.session_state.chat_history.clear()
     st.session_state.current_query = None
     st.session_state.current_results = None
     st.session_state.current_sql = None
@@ -88,29 +206,12 @@ if not st.session_state.authenticated:
 
     if st.button("Login"):
         try:
-            conn = snowflake.connector.connect(
-                user=st.session_state.username,
-                password=st.session_state.password,
-                account="GNB14769",
-                host=HOST,
-                port=443,
-                warehouse="CORTEX_SEARCH_TUTORIAL_WH",
-                role="DEV_BR_CORTEX_AI_ROLE",
-                database=DATABASE,
-                schema=SCHEMA,
+            manager = get_connection_pool().acquire(
+                st.session_state.username, st.session_state.password, get_script_run_ctx().session_id
             )
-            st.session_state.CONN = conn
-
-            snowpark_session = Session.builder.configs({
-                "connection": conn
-            }).create()
-            st.session_state.snowpark_session = snowpark_session
-
-            with conn.cursor() as cur:
-                cur.execute(f"USE DATABASE {DATABASE}")
-                cur.execute(f"USE SCHEMA {SCHEMA}")
-                cur.execute("ALTER SESSION SET TIMEZONE = 'UTC'")
-                cur.execute("ALTER SESSION SET QUOTED_IDENTIFIERS_IGNORE_CASE = TRUE")
+            st.session_state.connection_manager = manager
+            st.session_state.CONN = manager.connection
+            st.session_state.snowpark_session = manager.session
 
             st.session_state.authenticated = True
             st.success("Authentication successful! Redirecting...")
@@ -119,154 +220,139 @@ if not st.session_state.authenticated:
         except Exception as e:
             st.error(f"Authentication failed: {e}")
 else:
+    import pandas as pd
+    from chart_data import prepare_chart_data, result_hash
+    from cortex_pipeline import CortexPipeline, build_summary_prompt, summarize_unstructured_answer
+
+    # Reconnect transparently if the connection was closed for being idle or its session expired
+    try:
+        manager: ConnectionManager = get_connection_pool().acquire(
+            st.session_state.username, st.session_state.password, get_script_run_ctx().session_id
+        )
+    except Exception as e:
+        st.session_state.authenticated = False
+        st.error(f"Your Snowflake session expired and could not be renewed: {e}. Please log in again.")
+        st.stop()
+    st.session_state.connection_manager = manager
+    get_connection_pool().close_idle()
+    st.session_state.CONN = manager.connection
+    st.session_state.snowpark_session = manager.session
     session = st.session_state.snowpark_session
 
-    # Utility Functions
-    def run_snowflake_query(query):
-        try:
-            if not query:
-                st.warning("⚠️ No SQL query generated.")
-                return None
-            df = session.sql(query)
-            data = df.collect()
-            if not data:
-                return None
-            columns = df.schema.names
-            result_df = pd.DataFrame(data, columns=columns)
-            return result_df
-        except Exception as e:
-            st.error(f"❌ SQL Execution Error: {str(e)}")
-            return None
-
-    def is_structured_query(query: str):
-        structured_patterns = [
-            r'\b(county|number|where|group by|order by|completed units|sum|count|avg|max|min|least|highest|which)\b',
-            r'\b(total|how many|leads |profit|projects|jurisdiction|month|year|energy savings|kwh)\b'
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in structured_patterns)
-
-    def is_complete_query(query: str):
-        complete_patterns = [r'\b(generate|write|create|describe|explain)\b']
-        return any(re.search(pattern, query.lower()) for pattern in complete_patterns)
-
-    def is_summarize_query(query: str):
-        summarize_patterns = [r'\b(summarize|summary|condense)\b']
-        return any(re.search(pattern, query.lower()) for pattern in summarize_patterns)
-
-    def is_question_suggestion_query(query: str):
-        suggestion_patterns = [
-            r'\b(what|which|how)\b.*\b(questions|type of questions|queries)\b.*\b(ask|can i ask|pose)\b',
-            r'\b(give me|show me|list)\b.*\b(questions|examples|sample questions)\b'
-        ]
-        return any(re.search(pattern, query.lower()) for pattern in suggestion_patterns)
-
-    def complete(prompt, model="mistral-large"):
-        try:
-            prompt = prompt.replace("'", "\\'")
-            query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{model}', '{prompt}') AS response"
-            result = session.sql(query).collect()
-            return result[0]["RESPONSE"]
-        except Exception as e:
-            st.error(f"❌ COMPLETE Function Error: {str(e)}")
-            return None
+    def submit_with_context(fn, *args) -> Future:
+        """Run fn on the summary pool, attached to this script run so its st.* calls still render."""
+        ctx = get_script_run_ctx()
+        context = contextvars.copy_context()  # carries the current trace into the worker
 
-    def summarize(text):
-        try:
-            text = text.replace("'", "\\'")
-            query = f"SELECT SNOWFLAKE.CORTEX.SUMMARIZE('{text}') AS summary"
-            result = session.sql(query).collect()
-            return result[0]["SUMMARY"]
-        except Exception as e:
-            st.error(f"❌ SUMMARIZE Function Error: {str(e)}")
-            return None
-
-    def parse_sse_response(response_text: str) -> List[Dict]:
-        """Parse SSE response into a list of JSON objects."""
-        events = []
-        lines = response_text.strip().split("\n")
-        current_event = {}
-        for line in lines:
-            if line.startswith("event:"):
-                current_event["event"] = line.split(":", 1)[1].strip()
-            elif line.startswith("data:"):
-                data_str = line.split(":", 1)[1].strip()
-                if data_str != "[DONE]":  # Skip the [DONE] marker
-                    try:
-                        data_json = json.loads(data_str)
-                        current_event["data"] = data_json
-                        events.append(current_event)
-                        current_event = {}  # Reset for next event
-                    except json.JSONDecodeError as e:
-                        st.error(f"❌ Failed to parse SSE data: {str(e)} - Data: {data_str}")
-        return events
-
-    def snowflake_api_call(query: str, is_structured: bool = False):
-        payload = {
-            "model": "mistral-large",
-            "messages": [{"role": "user", "content": [{"type": "text", "text": query}]}],
-            "tools": []
-        }
-        if is_structured:
-            payload["tools"].append({"tool_spec": {"type": "cortex_analyst_text_to_sql", "name": "analyst1"}})
-            payload["tool_resources"] = {"analyst1": {"semantic_model_file": SEMANTIC_MODEL}}
-        else:
-            payload["tools"].append({"tool_spec": {"type": "cortex_search", "name": "search1"}})
-            payload["tool_resources"] = {"search1": {"name": CORTEX_SEARCH_SERVICES, "max_results": 1}}
+        def run():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return context.run(fn, *args)
 
+        return get_summary_executor().submit(run)
+
+    def refresh_session_token(expired_token: str) -> bool:
+        """Renew an expired session token. Returns True if a new token is available."""
         try:
-            resp = requests.post(
-                url=f"https://{HOST}{API_ENDPOINT}",
-                json=payload,
-                headers={
-                    "Authorization": f'Snowflake Token="{st.session_state.CONN.rest.token}"',
-                    "Content-Type": "application/json",
-                },
-                timeout=API_TIMEOUT // 1000
-            )
-            if st.session_state.debug_mode:  # Show debug info only if toggle is enabled
-                st.write(f"API Response Status: {resp.status_code}")
-                st.write(f"API Raw Response: {resp.text}")
-            if resp.status_code < 400:
-                if not resp.text.strip():
-                    st.error("❌ API returned an empty response.")
-                    return None
-                return parse_sse_response(resp.text)
-            else:
-                raise Exception(f"Failed request with status {resp.status_code}: {resp.text}")
+            manager.ensure_alive(force=True)
         except Exception as e:
-            st.error(f"❌ API Request Failed: {str(e)}")
-            return None
-
-    def summarize_unstructured_answer(answer):
-        sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|")\s', answer)
-        return "\n".join(f"• {sent.strip()}" for sent in sentences[:6])
-
-    def process_sse_response(response, is_structured):
-        sql = ""
-        search_results = []
-        if not response:
-            return sql, search_results
+            st.error(f"❌ Session Refresh Failed: {str(e)}")
+            return False
+        st.session_state.CONN = manager.connection
+        st.session_state.snowpark_session = pipeline.session = manager.session
+        return st.session_state.CONN.rest.token != expired_token
+
+    # Agent, SQL and LLM calls for this session; errors and debug output render in the page
+    pipeline = CortexPipeline(
+        session,
+        token_provider=lambda: manager.connection.rest.token,
+        http=get_http_session(),
+        refresh_token=refresh_session_token,
+        sql_cache=get_sql_cache(),
+        result_cache=get_result_cache(),
+        llm_cache=get_llm_cache(),
+        on_error=st.error,
+        on_warning=st.warning,
+        on_debug=st.write if st.session_state.debug_mode else None,
+        pending_query_ids=st.session_state.setdefault("pending_query_ids", set()),
+        submit=submit_with_context,
+        registry=get_model_registry(session),
+    )
+    # Callbacks that outlive this run (the intent router's LLM fallback) look the pipeline up here
+    st.session_state.pipeline = pipeline
+
+    # Utility Functions
+    def run_snowflake_query(query, offset=0, query_id=None):
+        """pipeline.run_snowflake_query, showing elapsed time and a Cancel button while the query runs."""
+        status = st.empty()
+        cancel_slot = st.empty()
+        shown = []
+
+        def progress(query_id: str, elapsed: float):
+            if not shown:
+                # Any click reruns the script, which interrupts the query wait and cancels the query
+                cancel_slot.button("Cancel query", key=f"cancel_{query_id}")
+                shown.append(query_id)
+            status.caption(f"⏳ Running query `{query_id}`... {elapsed:.0f}s")
+
         try:
-            for event in response:
-                if event.get("event") == "message.delta" and "data" in event:
-                    delta = event["data"].get("delta", {})
-                    content = delta.get("content", [])
-                    for item in content:
-                        if item.get("type") == "tool_results":
-                            tool_results = item.get("tool_results", {})
-                            if "content" in tool_results:
-                                for result in tool_results["content"]:
-                                    if result.get("type") == "json":
-                                        result_data = result.get("json", {})
-                                        if is_structured and "sql" in result_data:
-                                            sql = result_data.get("sql", "")
-                                        elif not is_structured and "searchResults" in result_data:
-                                            search_results = [sr["text"] for sr in result_data["searchResults"]]
-        except Exception as e:
-            st.error(f"❌ Error Processing Response: {str(e)}")
-        return sql.strip(), search_results
+            return pipeline.run_snowflake_query(query, offset, progress, query_id=query_id)
+        finally:
+            status.empty()
+            cancel_slot.empty()
+
+    def get_intent_router() -> IntentRouter:
+        """Keyword router built once per session; its LLM fallback uses the current run's pipeline."""
+        if "intent_router" not in st.session_state:
+            def complete(prompt: str):
+                # Not pipeline.complete: that pipeline's session is closed after a reconnect
+                return st.session_state.pipeline.complete(prompt)
+
+            fallback = make_llm_fallback(complete) if INTENT_LLM_FALLBACK else None
+            st.session_state.intent_router = IntentRouter(fallback=fallback)
+        return st.session_state.intent_router
+
+    def traced(name: str, fn, *args):
+        """Call fn inside a span of the current trace (for work handed to other threads)."""
+        with tracing.span(name):
+            return fn(*args)
+
+    def render_results_table(message: Dict, key: str):
+        """Show a message's results with a button that fetches the next page on demand."""
+        results = message["results"]
+        has_more = results.attrs.get("has_more", False)
+        st.markdown(f"**Query Results ({len(results)}{'+' if has_more else ''} rows):**")
+        st.dataframe(results)
+        if has_more and len(results) < MAX_RESULT_ROWS and st.button(f"Load {RESULT_PAGE_SIZE} more rows", key=key):
+            # Read on into the result set of the query that produced the first page
+            next_page = run_snowflake_query(message["sql"], offset=len(results), query_id=results.attrs.get("query_id"))
+            if next_page is not None:
+                combined = pd.concat([results, next_page], ignore_index=True)
+                combined.attrs.update(next_page.attrs)
+                st.session_state.chat_history.set_results(message, combined)
+                st.rerun()
 
     # Visualization Function
+    @st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+    def build_figure(result_key: str, _df: pd.DataFrame, x_col: str, y_col: str, chart_type: str):
+        """Plotly figure for a result set, memoized on (result hash, x, y, chart type)."""
+        import plotly.express as px  # Loaded the first time a chart is drawn
+        chart_data = prepare_chart_data(_df, x_col, y_col, chart_type, CHART_MAX_POINTS, CHART_TOP_N, CHART_HISTOGRAM_BINS)
+        plot_df = chart_data.df
+        title = f"{chart_type} ({chart_data.note})" if chart_data.note else chart_type
+        if chart_type == "Line Chart":
+            return px.line(plot_df, x=x_col, y=y_col, title=title)
+        elif chart_type == "Bar Chart":
+            return px.bar(plot_df, x=x_col, y="count" if chart_data.binned else y_col, title=title)
+        elif chart_type == "Pie Chart":
+            return px.pie(plot_df, names=x_col, values="count" if chart_data.binned else y_col, title=title)
+        elif chart_type == "Scatter Chart":
+            render_mode = "webgl" if len(_df) > CHART_MAX_POINTS else "auto"
+            return px.scatter(plot_df, x=x_col, y=y_col, title=title, render_mode=render_mode)
+        elif chart_type == "Histogram Chart":
+            if chart_data.binned:
+                return px.bar(plot_df, x=x_col, y="count", title=title)
+            return px.histogram(plot_df, x=x_col, title=title)
+
     def display_chart_tab(df: pd.DataFrame, prefix: str = "chart", query: str = ""):
         """Allows user to select chart options and displays a chart with unique widget keys."""
         if df.empty or len(df.columns) < 2:
@@ -307,43 +393,22 @@ else:
             type_index = chart_options.index(default_chart)
         chart_type = col3.selectbox("Chart Type", chart_options, index=type_index, key=f"{prefix}_type")
 
-        if chart_type == "Line Chart":
-            fig = px.line(df, x=x_col, y=y_col, title=chart_type)
-            st.plotly_chart(fig, key=f"{prefix}_line")
-        elif chart_type == "Bar Chart":
-            fig = px.bar(df, x=x_col, y=y_col, title=chart_type)
-            st.plotly_chart(fig, key=f"{prefix}_bar")
-        elif chart_type == "Pie Chart":
-            fig = px.pie(df, names=x_col, values=y_col, title=chart_type)
-            st.plotly_chart(fig, key=f"{prefix}_pie")
-        elif chart_type == "Scatter Chart":
-            fig = px.scatter(df, x=x_col, y=y_col, title=chart_type)
-            st.plotly_chart(fig, key=f"{prefix}_scatter")
-        elif chart_type == "Histogram Chart":
-            fig = px.histogram(df, x=x_col, title=chart_type)
-            st.plotly_chart(fig, key=f"{prefix}_hist")
+        chart_keys = {
+            "Line Chart": "line", "Bar Chart": "bar", "Pie Chart": "pie",
+            "Scatter Chart": "scatter", "Histogram Chart": "hist",
+        }
+        fig = build_figure(result_hash(df), df, x_col, y_col, chart_type)
+        st.plotly_chart(fig, key=f"{prefix}_{chart_keys[chart_type]}")
+
+    pipeline.cancel_orphaned_queries()
 
     # UI Logic
     with st.sidebar:
-        st.markdown("""
-        <style>
-        [data-testid="stSidebar"] [data-testid="stButton"] > button {
-            background-color: #29B5E8 !important;
-            color: white !important;
-            font-weight: bold !important;
-            width: 100% !important;
-            border-radius: 0px !important;
-            margin: 0 !important;
-            border: none !important;
-            padding: 0.5rem 1rem !important;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
         logo_container = st.container()
         button_container = st.container()
         about_container = st.container()
         help_container = st.container()
+        latency_container = st.container()
 
         with logo_container:
             logo_url = "https://www.snowflake.com/wp-content/themes/snowflake/assets/img/logo-blue.svg"
@@ -353,6 +418,15 @@ else:
             st.session_state.debug_mode = st.checkbox("Enable Debug Mode", value=st.session_state.debug_mode)
             if st.button("New Conversation", key="new_conversation"):
                 start_new_conversation()
+            if is_cache_admin():
+                if st.button("Clear Cache", key="clear_cache"):
+                    removed = clear_query_caches()
+                    st.success(f"Cached SQL, query results and LLM responses cleared for every app instance ({removed} shared entries).")
+            else:
+                st.caption(
+                    f"Cached SQL is replaced when its semantic model changes; cached results expire after "
+                    f"{RESULT_CACHE_TTL // 60} minutes."
+                )
 
         with about_container:
             st.markdown("### About")
@@ -362,6 +436,29 @@ else:
                 "Simply ask a question below to see relevant answers and visualizations."
             )
 
+        with latency_container:
+            stage_stats = get_tracer().percentiles()
+            if stage_stats:
+                with st.expander("⏱️ Latency by stage", expanded=False):
+                    st.dataframe(
+                        pd.DataFrame(
+                            [{"stage": name, "count": s["count"], "p50 ms": s["p50"], "p95 ms": s["p95"]}
+                             for name, s in stage_stats.items()]
+                        ),
+                        hide_index=True,
+                    )
+            if is_cache_admin():
+                with st.expander("🗄️ Shared cache", expanded=False):
+                    st.caption(f"Backend: {SHARED_CACHE_BACKEND}")
+                    st.dataframe(
+                        pd.DataFrame([{"cache": name, **get_cache().stats()} for name, get_cache in QUERY_CACHES.items()]),
+                        hide_index=True,
+                    )
+                    purge = st.multiselect("Purge", list(QUERY_CACHES), key="purge_caches")
+                    if purge and st.button("Purge selected", key="purge_selected"):
+                        removed = clear_query_caches(purge)
+                        st.success(f"Purged {', '.join(purge)} ({removed} shared entries).")
+
         with help_container:
             st.markdown("### Help & Documentation")
             st.write(
@@ -372,36 +469,33 @@ else:
 
     st.title("Cortex AI Assistant by DiLytics")
 
-    # Display the fixed semantic model
-    semantic_model_filename = SEMANTIC_MODEL.split("/")[-1]
-    st.markdown(f"Semantic Model: `{semantic_model_filename}`")
+    # Display the semantic models questions are routed between
+    semantic_model_filenames = [entry.semantic_model_file.split("/")[-1] for entry in pipeline.registry.entries]
+    st.markdown(f"Semantic Model{'s' if len(semantic_model_filenames) > 1 else ''}: " + ", ".join(f"`{name}`" for name in semantic_model_filenames))
 
     st.sidebar.subheader("Sample Questions")
-    sample_questions = [
-        "What is Eco Sustain Innovations?",
-        "What is Green Residences program?",
-        "Describe the energy savings technologies used in Green Residences.",
-        "Show total energy savings by county.",
-        "Which county has the highest kWh savings?",
-        "How many active projects are there",
-        "What is the average kWh savings",
-        "Which counties has the min and max of kWh savings",
-        "Which counties has the least and highest of kWh savings"
-    ]
+    sample_questions = SAMPLE_QUESTIONS
 
     # Display chat history
-    for message in st.session_state.chat_history:
+    history = st.session_state.chat_history
+    for index, message in enumerate(history):
+        key = message["id"]
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
-            if message["role"] == "assistant" and "results" in message and message["results"] is not None:
+            if message["role"] == "assistant" and message.get("sql"):
                 with st.expander("View SQL Query", expanded=False):
                     st.code(message["sql"], language="sql")
-                st.markdown(f"**Query Results ({len(message['results'])} rows):**")
-                st.dataframe(message["results"])
-                # Only show visualization if it can be rendered
-                if not message["results"].empty and len(message["results"].columns) >= 2:
-                    st.markdown("**📈 Visualization:**")
-                    display_chart_tab(message["results"], prefix=f"chart_{hash(message['content'])}", query=message.get("query", ""))
+                # Only the latest answer is shown by default; older results are read back when toggled on
+                if st.toggle("Show results", value=index == len(history) - 1, key=f"show_results_{key}"):
+                    results = history.load_results(message)
+                    if results is None:
+                        st.caption("These results are no longer kept. Ask the question again to re-run the query.")
+                    else:
+                        render_results_table(message, key=f"more_rows_{key}")
+                        # Only show visualization if it can be rendered
+                        if not results.empty and len(results.columns) >= 2:
+                            st.markdown("**📈 Visualization:**")
+                            display_chart_tab(results, prefix=f"chart_{key}", query=message.get("query", ""))
 
     query = st.chat_input("Ask your question...")
 
@@ -420,15 +514,19 @@ else:
         with st.chat_message("user"):
             st.markdown(query)
 
-        with st.chat_message("assistant"):
+        with st.chat_message("assistant"), get_tracer().start_trace(query).activate():
             with st.spinner("Generating Response..."):
-                is_structured = is_structured_query(query)
-                is_complete = is_complete_query(query)
-                is_summarize = is_summarize_query(query)
-                is_suggestion = is_question_suggestion_query(query)
-
-                assistant_response = {"role": "assistant", "content": "", "query": query}
-                if is_suggestion:
+                with tracing.span("intent") as attrs:
+                    intent = get_intent_router().classify(query)
+                    attrs["intent"] = intent.intent
+                if st.session_state.debug_mode:
+                    st.write(f"Intent: {intent.intent} (evidence: {', '.join(intent.evidence) or 'none'})")
+                    model = pipeline.registry.route(query)
+                    st.write(f"Semantic model: {model.entry.name} (evidence: {', '.join(model.evidence) or 'none'})")
+
+                # The id is set now so the widgets drawn below keep their keys once the message is in history
+                assistant_response = {"role": "assistant", "content": "", "query": query, "id": uuid.uuid4().hex}
+                if intent.intent == SUGGESTION:
                     response_content = "**Here are some questions you can ask me:**\n"
                     for i, q in enumerate(sample_questions, 1):
                         response_content += f"{i}. {q}\n"
@@ -436,8 +534,9 @@ else:
                     st.markdown(response_content)
                     assistant_response["content"] = response_content
 
-                elif is_complete:
-                    response = complete(query)
+                elif intent.intent == COMPLETE:
+                    with tracing.span("llm_complete"):
+                        response = pipeline.complete(query)
                     if response:
                         response_content = f"**✍️ Generated Response:**\n{response}"
                         st.markdown(response_content)
@@ -447,8 +546,9 @@ else:
                         st.warning(response_content)
                         assistant_response["content"] = response_content
 
-                elif is_summarize:
-                    summary = summarize(query)
+                elif intent.intent == SUMMARIZE:
+                    with tracing.span("llm_summary"):
+                        summary = pipeline.summarize(query)
                     if summary:
                         response_content = f"**Summary:**\n{summary}"
                         st.markdown(response_content)
@@ -458,28 +558,41 @@ else:
                         st.warning(response_content)
                         assistant_response["content"] = response_content
 
-                elif is_structured:
-                    response = snowflake_api_call(query, is_structured=True)
-                    sql, _ = process_sse_response(response, is_structured=True)
+                elif intent.intent == STRUCTURED:
+                    sql = pipeline.generate_sql(query)
                     if sql:
                         results = run_snowflake_query(sql)
                         if results is not None and not results.empty:
-                            # Convert results to string and use complete function for natural language summary
-                            results_text = results.to_string(index=False)
-                            prompt = f"Provide a concise natural language answer to the query '{query}' using the following data, avoiding phrases like 'Based on the query results':\n\n{results_text}"
-                            summary = complete(prompt)
-                            if not summary:
-                                summary = "⚠️ Unable to generate a natural language summary."
-                            response_content = f"**✍️ Generated Response:**\n{summary}"
-                            st.markdown(response_content)
+                            # Encode results compactly and use complete function for natural language summary
+                            prompt, encoded = build_summary_prompt(query, results)
+                            summary_placeholder = st.empty()
+                            if encoded.has_more:
+                                st.caption(f"Results were cut off at {encoded.total_rows} rows; the summary covers only those rows.")
+                            elif encoded.rows_included < encoded.total_rows:
+                                st.caption(f"Summary uses {encoded.rows_included} of {encoded.total_rows} rows plus column statistics.")
+                            if PARALLEL_SUMMARY:
+                                # Show the table and chart right away; the summary fills the placeholder when ready
+                                summary_future = submit_with_context(traced, "llm_summary", pipeline.complete, prompt)
+                                summary_placeholder.info("✍️ Generating natural language summary...")
+                            else:
+                                summary_future = None
+                                with tracing.span("llm_summary"):
+                                    summary = pipeline.complete(prompt)
                             with st.expander("View SQL Query", expanded=False):
                                 st.code(sql, language="sql")
-                            st.markdown(f"**Query Results ({len(results)} rows):**")
-                            st.dataframe(results)
+                            assistant_response.update({"sql": sql, "results": results})
+                            render_results_table(assistant_response, key=f"more_rows_{assistant_response['id']}")
                             # Only show visualization if it can be rendered
                             if len(results.columns) >= 2:
                                 st.markdown("**📈 Visualization:**")
-                                display_chart_tab(results, prefix=f"chart_{hash(query)}", query=query)
+                                with tracing.span("chart_render"):
+                                    display_chart_tab(results, prefix=f"chart_{assistant_response['id']}", query=query)
+                            if summary_future is not None:
+                                summary = summary_future.result()
+                            if not summary:
+                                summary = "⚠️ Unable to generate a natural language summary."
+                            response_content = f"**✍️ Generated Response:**\n{summary}"
+                            summary_placeholder.markdown(response_content)
                             assistant_response.update({
                                 "content": response_content,
                                 "sql": sql,
@@ -496,11 +609,8 @@ else:
                         assistant_response["content"] = response_content
 
                 else:
-                    response = snowflake_api_call(query, is_structured=False)
-                    _, search_results = process_sse_response(response, is_structured=False)
-                    if search_results:
-                        raw_result = search_results[0]
-                        summary = summarize(raw_result)
+                    summary, passages = pipeline.search_answer(query)
+                    if passages:
                         if summary:
                             response_content = f"**Here is the Answer:**\n{summary}"
                             last_sentence = summary.split(".")[-2] if "." in summary else summary
@@ -508,7 +618,7 @@ else:
                             st.success(f" Key Insight: {last_sentence.strip()}")
                             assistant_response["content"] = response_content
                         else:
-                            response_content = f"**🔍 Key Information (Unsummarized):**\n{summarize_unstructured_answer(raw_result)}"
+                            response_content = f"**🔍 Key Information (Unsummarized):**\n{summarize_unstructured_answer(passages[0])}"
                             st.markdown(response_content)
                             assistant_response["content"] = response_content
                     else:
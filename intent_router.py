@@ -0,0 +1,126 @@
+"""Single-pass routing of user questions to the assistant's answer paths."""
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Intents, in the order they win when several match
+SUGGESTION = "suggestion"
+COMPLETE = "complete"
+SUMMARIZE = "summarize"
+STRUCTURED = "structured"
+SEARCH = "search"  # default when nothing else matches
+INTENT_PRIORITY = (SUGGESTION, COMPLETE, SUMMARIZE, STRUCTURED, SEARCH)
+
+DEFAULT_KEYWORDS: Dict[str, Sequence[str]] = {
+    COMPLETE: ["generate", "write", "create", "describe", "explain"],
+    SUMMARIZE: ["summarize", "summary", "condense"],
+    STRUCTURED: [
+        "county", "number", "where", "group by", "order by", "completed units", "sum", "count",
+        "avg", "max", "min", "least", "highest", "which",
+        "total", "how many", "leads", "profit", "projects", "jurisdiction", "month", "year",
+        "energy savings", "kwh",
+    ],
+}
+
+# Multi-part patterns that can't be expressed as single keywords
+DEFAULT_PHRASE_PATTERNS: Dict[str, Sequence[str]] = {
+    SUGGESTION: [
+        r'\b(what|which|how)\b.*\b(questions|type of questions|queries)\b.*\b(ask|can i ask|pose)\b',
+        r'\b(give me|show me|list)\b.*\b(questions|examples|sample questions)\b',
+    ],
+}
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    score: float
+    evidence: Tuple[str, ...]
+
+
+# A fallback gets the question and the keyword ranking and may return a better intent
+Fallback = Callable[[str, List[IntentMatch]], Optional[str]]
+
+
+class IntentRouter:
+    """Classifies a question with one scan over a precompiled keyword pattern.
+
+    Every keyword intent is a named group of a single alternation, so one
+    `finditer` collects the evidence for all of them. Ties are broken by
+    INTENT_PRIORITY, which reproduces the original if/elif cascade. When the
+    result is ambiguous (no match, or several intents matched) an optional
+    fallback classifier, e.g. an embedding or Cortex model, gets the last word.
+    """
+
+    def __init__(
+        self,
+        keywords: Dict[str, Sequence[str]] = DEFAULT_KEYWORDS,
+        phrase_patterns: Dict[str, Sequence[str]] = DEFAULT_PHRASE_PATTERNS,
+        fallback: Optional[Fallback] = None,
+    ):
+        groups = []
+        for intent, words in keywords.items():
+            # Longest first so "how many" wins over a shorter overlapping keyword
+            alternation = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+            groups.append(f"(?P<{intent}>{alternation})")
+        self._keyword_re = re.compile(r"\b(?:" + "|".join(groups) + r")\b")
+        self._phrase_res = {
+            intent: [re.compile(p) for p in patterns] for intent, patterns in phrase_patterns.items()
+        }
+        self.fallback = fallback
+
+    def rank(self, query: str) -> List[IntentMatch]:
+        """All matching intents, best first, ending with SEARCH as the default."""
+        text = query.lower()
+        evidence: Dict[str, List[str]] = {}
+        for intent, patterns in self._phrase_res.items():
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match:
+                    evidence.setdefault(intent, []).append(match.group(0))
+        for match in self._keyword_re.finditer(text):
+            evidence.setdefault(match.lastgroup, []).append(match.group(0))
+        ranked = [
+            IntentMatch(intent, float(len(evidence[intent])), tuple(evidence[intent]))
+            for intent in INTENT_PRIORITY if intent in evidence
+        ]
+        ranked.append(IntentMatch(SEARCH, 0.0, ()))
+        return ranked
+
+    def classify(self, query: str) -> IntentMatch:
+        ranked = self.rank(query)
+        if self.fallback is not None and self.is_ambiguous(ranked):
+            chosen = self.fallback(query, ranked)
+            if chosen in INTENT_PRIORITY:
+                evidence = next((m.evidence for m in ranked if m.intent == chosen), ())
+                return IntentMatch(chosen, 1.0, evidence + ("fallback",))
+        return ranked[0]
+
+    @staticmethod
+    def is_ambiguous(ranked: List[IntentMatch]) -> bool:
+        matched = [m for m in ranked if m.intent != SEARCH]
+        return len(matched) != 1
+
+
+def make_llm_fallback(complete: Callable[[str], Optional[str]], intents: Iterable[str] = INTENT_PRIORITY) -> Fallback:
+    """Build a fallback that asks an LLM completion function to pick the intent."""
+    labels = list(intents)
+    descriptions = {
+        SUGGESTION: "the user asks which questions they can ask",
+        COMPLETE: "the user wants free-form text generated or explained",
+        SUMMARIZE: "the user wants a text summarized",
+        STRUCTURED: "the answer needs numbers aggregated from the program database",
+        SEARCH: "the answer is in program documents",
+    }
+
+    def fallback(query: str, ranked: List[IntentMatch]) -> Optional[str]:
+        options = "\n".join(f"- {label}: {descriptions.get(label, label)}" for label in labels)
+        prompt = (
+            f"Classify the question into exactly one of these labels:\n{options}\n\n"
+            f"Question: {query}\nAnswer with the label only."
+        )
+        response = complete(prompt)
+        if not response:
+            return None
+        answer = response.strip().lower()
+        return next((label for label in labels if label in answer), None)
+
+    return fallback
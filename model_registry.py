@@ -0,0 +1,141 @@
+"""Registry of semantic models and search services, with keyword routing of questions."""
+import hashlib
+import logging
+import re
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Column names too common to say anything about which model a question is for
+GENERIC_TERMS = frozenset(["id", "name", "date", "type", "status", "value", "count", "amount", "description"])
+# Sections of a semantic model YAML whose entries have a name and synonyms
+_NAMED_SECTIONS = ("dimensions", "time_dimensions", "measures", "facts", "metrics", "filters")
+
+
+class ModelEntry(NamedTuple):
+    name: str
+    semantic_model_file: str
+    search_service: str
+    terms: Tuple[str, ...]
+    version: str = ""  # digest of the semantic model YAML; "" when it wasn't read
+
+
+class ModelMatch(NamedTuple):
+    entry: ModelEntry
+    score: float
+    evidence: Tuple[str, ...]
+
+
+def _term(text: str) -> str:
+    return re.sub(r"[\s_]+", " ", str(text).strip().lower())
+
+
+def terms_from_semantic_model(yaml_text: str) -> List[str]:
+    """Table, column, metric and filter names plus their synonyms from a semantic model YAML."""
+    import yaml
+
+    model = yaml.safe_load(yaml_text) or {}
+    found: List[str] = []
+
+    def add(item: Dict) -> None:
+        found.append(item.get("name", ""))
+        found.extend(item.get("synonyms") or ())
+
+    for table in model.get("tables") or ():
+        add(table)
+        base_table = table.get("base_table") or {}
+        if base_table.get("table"):
+            found.append(base_table["table"])
+        for section in _NAMED_SECTIONS:
+            for item in table.get(section) or ():
+                add(item)
+    for section in ("metrics", "relationships"):
+        for item in model.get(section) or ():
+            add(item)
+    return found
+
+
+def stage_yaml_loader(session) -> Callable[[str], str]:
+    """Read a staged semantic model file through a Snowpark session."""
+    def load(semantic_model_file: str) -> str:
+        with session.file.get_stream(semantic_model_file) as stream:
+            return stream.read().decode("utf-8")
+    return load
+
+
+class ModelRegistry:
+    """Semantic models and search services, with one-pass keyword routing.
+
+    Every term of every model goes into one precompiled alternation, so a single
+    `finditer` over the question finds the evidence for all models. A term shared
+    by several models counts 1/n towards each of them. Questions that match
+    nothing, and ties, go to the earliest entry, so the first entry is the default.
+    """
+
+    def __init__(self, entries: Sequence[ModelEntry]):
+        if not entries:
+            raise ValueError("ModelRegistry needs at least one semantic model")
+        self.entries = list(entries)
+        self._models_by_term: Dict[str, Set[int]] = {}
+        for index, entry in enumerate(self.entries):
+            for term in entry.terms:
+                self._models_by_term.setdefault(term, set()).add(index)
+        # Longest first so "energy savings" wins over "energy"; an optional plural ending is allowed
+        alternation = "|".join(re.escape(t) for t in sorted(self._models_by_term, key=len, reverse=True))
+        self._term_re = re.compile(r"\b(" + alternation + r")(?:s|es)?\b") if alternation else None
+
+    @classmethod
+    def from_config(cls, specs: Iterable[Dict], load_yaml: Optional[Callable[[str], str]] = None) -> "ModelRegistry":
+        """Build from config dicts (name, semantic_model_file, search_service, keywords).
+
+        With `load_yaml`, each semantic model file is read once and its tables,
+        columns and synonyms are added to the model's keywords, and a digest of
+        its text becomes the entry's version. A model whose file can't be read
+        keeps only its configured keywords.
+        """
+        entries = []
+        for spec in specs:
+            raw_terms = list(spec.get("keywords", ()))
+            version = ""
+            if load_yaml is not None:
+                try:
+                    yaml_text = load_yaml(spec["semantic_model_file"])
+                    version = hashlib.sha256(yaml_text.encode("utf-8")).hexdigest()[:12]
+                    raw_terms.extend(terms_from_semantic_model(yaml_text))
+                except Exception as e:
+                    logger.warning("Could not read semantic model %s: %s", spec["semantic_model_file"], e)
+            terms = []
+            for raw in raw_terms:
+                term = _term(raw)
+                if len(term) >= 3 and term not in GENERIC_TERMS and term not in terms:
+                    terms.append(term)
+            entries.append(
+                ModelEntry(spec["name"], spec["semantic_model_file"], spec["search_service"], tuple(terms), version)
+            )
+        return cls(entries)
+
+    @property
+    def default(self) -> ModelEntry:
+        return self.entries[0]
+
+    def rank(self, query: str) -> List[ModelMatch]:
+        """Models with any matching term, best first; the default entry if none match."""
+        scores: Dict[int, float] = {}
+        evidence: Dict[int, List[str]] = {}
+        if self._term_re is not None:
+            for match in self._term_re.finditer(_term(query)):
+                models = self._models_by_term[match.group(1)]
+                for index in models:
+                    scores[index] = scores.get(index, 0.0) + 1 / len(models)
+                    evidence.setdefault(index, []).append(match.group(1))
+        if not scores:
+            return [ModelMatch(self.default, 0.0, ())]
+        order = sorted(scores, key=lambda i: (-scores[i], i))
+        return [ModelMatch(self.entries[i], scores[i], tuple(evidence[i])) for i in order]
+
+    def route(self, query: str) -> ModelMatch:
+        return self.rank(query)[0]
+
+    def version(self, semantic_model_file: str) -> str:
+        """Content digest of a registered semantic model, "" if it is unknown or wasn't read."""
+        return next((e.version for e in self.entries if e.semantic_model_file == semantic_model_file), "")
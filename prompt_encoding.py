@@ -0,0 +1,118 @@
+"""Helpers for keeping Cortex LLM prompts within a token budget."""
+from decimal import Decimal
+from typing import NamedTuple
+
+CHARS_PER_TOKEN = 4  # rough average for English text and tabular data
+TRUNCATION_NOTE_CHARS = 64  # room reserved for the "... omitted" note
+STATS_TOP_VALUES = 5  # most frequent values listed for non-numeric columns
+
+
+class EncodedResults(NamedTuple):
+    text: str
+    rows_included: int
+    total_rows: int
+    strategy: str  # "full", "head" or "sample"
+    has_more: bool = False  # the rows are only the first part of the query result
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text without calling a tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_token_budget(text: str, max_tokens: int) -> str:
+    """Cut text at a line boundary so it fits in max_tokens, noting how many lines were dropped."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(max_tokens * CHARS_PER_TOKEN - TRUNCATION_NOTE_CHARS, 0)
+    lines = text.split("\n")
+    kept = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > max_chars:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    if not kept:  # a single very long line
+        return text[:max_chars] + "... (truncated)"
+    return "\n".join(kept) + f"\n... ({len(lines) - len(kept)} more lines omitted)"
+
+
+def _decimals_to_float(df):
+    """Snowflake NUMBER columns arrive as Decimal objects that print up to 28 digits."""
+    converted = {}
+    for col in df.columns:
+        if df[col].dtype == object:
+            first = df[col].dropna().head(1)
+            if len(first) and isinstance(first.iloc[0], Decimal):
+                converted[col] = df[col].astype(float)
+    return df.assign(**converted) if converted else df
+
+
+def results_to_csv(df) -> str:
+    """Compact CSV rendering of a DataFrame: no index, no padding, short floats."""
+    return _decimals_to_float(df).to_csv(index=False, float_format="%.6g", lineterminator="\n").rstrip("\n")
+
+
+def summary_statistics(df) -> str:
+    """One line per column: min/max/mean/sum for numeric columns, top values for the rest."""
+    lines = []
+    for col in df.columns:
+        series = df[col].dropna()
+        try:
+            values = series.astype(float)
+        except (TypeError, ValueError):
+            values = None
+        if values is not None and len(values):
+            lines.append(
+                f"{col}: min={values.min():.6g}, max={values.max():.6g}, "
+                f"mean={values.mean():.6g}, sum={values.sum():.6g}"
+            )
+        else:
+            counts = series.astype(str).value_counts().head(STATS_TOP_VALUES)
+            top = ", ".join(f"{value} ({count})" for value, count in counts.items())
+            lines.append(f"{col}: {series.nunique()} distinct, top: {top}")
+    return "\n".join(lines)
+
+
+def rows_within_budget(df, max_tokens: int) -> int:
+    """Largest number of leading rows whose CSV fits in max_tokens."""
+    if max_tokens <= 0 or df.empty:
+        return 0
+    probe = df.head(100)
+    chars_per_row = max(len(results_to_csv(probe)) / len(probe), 1)
+    n = min(int(max_tokens * CHARS_PER_TOKEN / chars_per_row), len(df))
+    while n > 0 and estimate_tokens(results_to_csv(df.head(n))) > max_tokens:
+        n = int(n * 0.9)
+    return n
+
+
+def encode_results(df, max_tokens: int, strategy: str = "head", has_more: bool = False) -> EncodedResults:
+    """Serialize a result DataFrame for an LLM prompt within max_tokens.
+
+    The whole table is sent as CSV when it fits. Otherwise as many rows as fit are
+    sent, the first ones or a random sample depending on `strategy`, followed by
+    statistics computed over every row. `has_more` means df holds only the first
+    rows of a longer result, which the text then says.
+    """
+    total = len(df)
+    note = f"Only the first {total} rows of the query result were fetched; the rest were cut off.\n\n" if has_more else ""
+    full = note + results_to_csv(df)
+    if estimate_tokens(full) <= max_tokens:
+        return EncodedResults(full, total, total, "full", has_more)
+
+    scope = f"the first {total} rows (the results were cut off)" if has_more else f"all {total} rows"
+    stats = truncate_to_token_budget(
+        f"Summary statistics over {scope}:\n{summary_statistics(df)}", max_tokens // 2
+    )
+    n = rows_within_budget(df, max_tokens - estimate_tokens(stats) - TRUNCATION_NOTE_CHARS // CHARS_PER_TOKEN)
+    if strategy == "sample":
+        rows = df.sample(n=n, random_state=0).sort_index()
+        label = f"A random sample of {n} of {total} rows"
+    else:
+        rows = df.head(n)
+        label = f"The first {n} of {total} rows"
+    parts = [stats]
+    if n:
+        parts.insert(0, f"{label}:\n{results_to_csv(rows)}")
+    return EncodedResults("\n\n".join(parts), n, total, strategy, has_more)
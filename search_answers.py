@@ -0,0 +1,73 @@
+"""De-duplication, ranking and merging of Cortex Search passages for one answer."""
+import re
+from typing import FrozenSet, Iterable, List, Optional
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE_END = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|"|\?|!)\s+')
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it me of on or show tell the "
+    "this to was what when where which who why with".split()
+)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[str]:
+    words = _words(text)
+    if len(words) <= size:
+        return frozenset([" ".join(words)])
+    return frozenset(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def dedupe_passages(passages: Iterable[str], threshold: float = 0.8) -> List[str]:
+    """Drop passages that repeat an earlier one.
+
+    Two passages are duplicates when the share of word 3-grams they have in common,
+    relative to the shorter one, reaches `threshold`; this also catches a passage
+    contained in a longer one. The earlier (higher ranked) passage is kept.
+    """
+    kept: List[str] = []
+    kept_shingles: List[FrozenSet[str]] = []
+    for passage in passages:
+        if not passage or not passage.strip():
+            continue
+        shingles = _shingles(passage)
+        if any(len(shingles & other) / min(len(shingles), len(other)) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def rank_passages(question: str, passages: List[str]) -> List[str]:
+    """Order passages by the search service's rank blended with coverage of the question's terms.
+
+    The service's order is a semantic relevance signal, so it is kept as a prior
+    (1 / (1 + position)); passages that mention more of the question's content
+    words move up ahead of ones that only matched loosely.
+    """
+    terms = {w for w in _words(question) if w not in STOPWORDS}
+
+    def score(item):
+        position, passage = item
+        coverage = len(terms & set(_words(passage))) / len(terms) if terms else 0.0
+        return 1 / (1 + position) + coverage
+
+    return [passage for _, passage in sorted(enumerate(passages), key=score, reverse=True)]
+
+
+def merge_summaries(summaries: Iterable[Optional[str]]) -> Optional[str]:
+    """Join per-passage summaries into one answer, dropping sentences already said."""
+    sentences: List[str] = []
+    seen = set()
+    for summary in summaries:
+        if not summary:
+            continue
+        for sentence in _SENTENCE_END.split(summary.strip()):
+            key = " ".join(_words(sentence))
+            if key and key not in seen:
+                seen.add(key)
+                sentences.append(sentence.strip())
+    return " ".join(sentences) or None
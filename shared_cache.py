@@ -0,0 +1,313 @@
+"""Cache shared by every process of the app, in SQLite or Redis, fronted by an in-process TTLCache.
+
+Values are stored as bytes: strings as UTF-8 and DataFrames as Arrow IPC streams
+(their `attrs` kept in the schema metadata). Keys are versioned with CACHE_VERSION
+and a per-namespace generation counter, so purging a namespace makes old entries
+unreachable on every replica at once. SQLite is shared by the processes of one
+host; replicas on several hosts need Redis.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from result_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def dumps(value: Any) -> bytes:
+    if isinstance(value, str):
+        return b"S" + value.encode("utf-8")
+    if hasattr(value, "to_parquet"):  # pandas DataFrame
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"attrs"] = json.dumps(value.attrs, default=str).encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return b"A" + sink.getvalue().to_pybytes()
+    return b"J" + json.dumps(value).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    tag, body = data[:1], data[1:]
+    if tag == b"S":
+        return body.decode("utf-8")
+    if tag == b"A":
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+        df = table.to_pandas()
+        df.attrs.update(json.loads((table.schema.metadata or {}).get(b"attrs", b"{}")))
+        return df
+    return json.loads(body)
+
+
+class SQLiteBackend:
+    """Cache table in a SQLite file (WAL mode), shared by the processes of one host.
+
+    WAL needs shared memory, so the file must be on a local disk, not NFS or
+    another network filesystem.
+
+    The file holds query results, so it is made readable by its owner only, and a
+    missing parent directory is created private. Expired entries and, past
+    `max_bytes`, the oldest entries are removed every `evict_every` writes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_bytes: int, evict_every: int = 64):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Create the file before SQLite does so it never exists with the umask's mode; the
+        # -wal and -shm files SQLite adds later take the database file's permissions
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+        )
+        db.execute("CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._db().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        self._db().execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now + ttl, now),
+        )
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        db = self._db()
+        db.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        excess = (db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]) - self.max_bytes
+        if excess <= 0:
+            return
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM cache ORDER BY stored_at"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        db.executemany("DELETE FROM cache WHERE key = ?", doomed)
+
+    def counter(self, key: str) -> int:
+        row = self._db().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key: str) -> int:
+        db = self._db()
+        db.execute(
+            "INSERT INTO counters (key, value) VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1", (key,)
+        )
+        return self.counter(key)
+
+    def purge(self, prefix: str) -> int:
+        return self._db().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)).rowcount
+
+    def stats(self, prefix: str) -> Dict[str, int]:
+        entries, size = self._db().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE substr(key, 1, ?) = ? AND expires_at >= ?",
+            (len(prefix), prefix, time.time()),
+        ).fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+class RedisBackend:
+    """Any Redis-compatible server; needs the optional `redis` package. Size limits are left to the server."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, socket_timeout=2)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._redis.set(key, value, ex=max(1, int(ttl)))
+
+    def counter(self, key: str) -> int:
+        return int(self._redis.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self._redis.incr(key)
+
+    def purge(self, prefix: str) -> int:
+        removed = 0
+        batch = []
+        for key in self._redis.scan_iter(match=prefix + "*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                removed += self._redis.delete(*batch)
+                batch = []
+        if batch:
+            removed += self._redis.delete(*batch)
+        return removed
+
+    def stats(self, prefix: str) -> Dict[str, int]:
+        return {"entries": sum(1 for _ in self._redis.scan_iter(match=prefix + "*", count=500))}
+
+
+def make_backend(kind: str, sqlite_path: str, sqlite_max_bytes: int, redis_url: str):
+    """The configured backend, or None (process-local caching only) for "memory".
+
+    A store that can't be opened (an unwritable cache directory, the redis package
+    missing) is logged and also gives None, so it only costs hit rate.
+    """
+    if kind not in ("sqlite", "redis", "memory"):
+        raise ValueError(f"Unknown cache backend: {kind}")
+    try:
+        if kind == "sqlite":
+            return SQLiteBackend(sqlite_path, sqlite_max_bytes)
+        if kind == "redis":
+            return RedisBackend(redis_url)
+    except Exception as e:
+        logger.warning("Shared cache backend %s unavailable, caching per process only: %s", kind, e)
+    return None
+
+
+class SharedCache:
+    """TTLCache-compatible cache for one namespace (e.g. "sql"), backed by a shared store.
+
+    Lookups go to the in-process `local` cache first, then to the backend. Backend
+    errors are logged and treated as misses, so an unavailable store only costs
+    hit rate. `clear()` purges the namespace for every process sharing the backend.
+    """
+
+    def __init__(self, backend, namespace: str, ttl: float, local: TTLCache, version: str = "",
+                 generation_check_interval: float = 10.0):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = local
+        self.version = version
+        self.generation_check_interval = generation_check_interval
+        self._generation = (0, float("-inf"))  # (generation, monotonic time it was read)
+        self._lock = threading.Lock()
+
+    @property
+    def _base(self) -> str:
+        return f"cortex:{self.version}:{self.namespace}:"
+
+    def generation(self) -> int:
+        """Purge counter of the namespace, re-read from the backend at most every few seconds."""
+        generation, checked_at = self._generation
+        if self.backend is None or time.monotonic() - checked_at < self.generation_check_interval:
+            return generation
+        try:
+            generation = self.backend.counter(self._base + "generation")
+        except Exception as e:
+            logger.warning("Shared cache unavailable: %s", e)
+        with self._lock:
+            self._generation = (generation, time.monotonic())
+        return generation
+
+    def _key(self, generation: int, key: Hashable) -> str:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return f"{self._base}g{generation}:{digest}"
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        generation = self.generation()
+        value = self.local.get((generation, key))
+        if value is None:
+            value = self._shared_get(generation, key)
+            if value is not None:
+                self.local.set((generation, key), value)
+        return default if value is None else value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        generation = self.generation()
+
+        def shared_or_compute():
+            value = self._shared_get(generation, key)
+            if value is None:
+                value = compute()
+                if value is not None:
+                    self._shared_set(generation, key, value)
+            return value
+
+        # The local cache coalesces concurrent misses in this process into one lookup / computation
+        return self.local.get_or_compute((generation, key), shared_or_compute)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        generation = self.generation()
+        self.local.set((generation, key), value)
+        self._shared_set(generation, key, value)
+
+    def clear(self) -> int:
+        """Purge the namespace everywhere. Returns the number of shared entries removed."""
+        self.local.clear()
+        if self.backend is None:
+            return 0
+        try:
+            old_prefix = f"{self._base}g{self.generation()}:"
+            generation = self.backend.incr(self._base + "generation")
+            with self._lock:
+                self._generation = (generation, time.monotonic())
+            return self.backend.purge(old_prefix)
+        except Exception as e:
+            logger.warning("Shared cache purge failed: %s", e)
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"local_" + name: value for name, value in self.local.stats().items()}
+        if self.backend is not None:
+            try:
+                stats.update({"shared_" + name: value for name, value in
+                              self.backend.stats(f"{self._base}g{self.generation()}:").items()})
+            except Exception as e:
+                logger.warning("Shared cache unavailable: %s", e)
+        return stats
+
+    def _shared_get(self, generation: int, key: Hashable) -> Any:
+        if self.backend is None:
+            return None
+        try:
+            data = self.backend.get(self._key(generation, key))
+            return None if data is None else loads(data)
+        except Exception as e:
+            logger.warning("Shared cache read failed: %s", e)
+            return None
+
+    def _shared_set(self, generation: int, key: Hashable, value: Any) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(self._key(generation, key), dumps(value), self.ttl)
+        except Exception as e:
+            logger.warning("Shared cache write failed: %s", e)
@@ -0,0 +1,104 @@
+"""Server-sent events parser for Cortex Agent responses.
+
+Follows the SSE framing rules (multi-line `data:` fields, comments, CR/LF/CRLF line
+ends, dispatch on a blank line) and can skip events the caller does not need before
+their JSON is decoded. Uses orjson for decoding when it is installed.
+"""
+import json
+import logging
+import time
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Union
+
+import tracing
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+logger = logging.getLogger(__name__)
+
+Line = Union[bytes, str]
+
+DONE_MARKER = b"[DONE]"
+# message.delta events carrying a tool result; text deltas are skipped without decoding
+TOOL_RESULT_EVENTS = ("message.delta",)
+TOOL_RESULT_MARKER = b'"tool_results"'
+
+
+def _as_bytes(line: Line) -> bytes:
+    return line if isinstance(line, bytes) else line.encode("utf-8")
+
+
+def iter_sse_events(
+    lines: Iterable[Line],
+    on_error: Callable[[str], None] = logger.error,
+    event_types: Optional[Collection[str]] = None,
+    must_contain: Optional[bytes] = None,
+) -> Iterator[Dict]:
+    """Yield {"event": ..., "data": ...} for each event in an iterable of lines.
+
+    Events whose type is not in `event_types`, or whose raw data lacks the
+    `must_contain` substring, are dropped without decoding their JSON.
+    """
+    event_name = None
+    data_lines: List[bytes] = []
+    parse_time = 0.0  # time spent decoding, excluding waits on the network and the consumer
+    events = skipped = 0
+    wanted = None if event_types is None else {name.encode("utf-8") for name in event_types}
+
+    def dispatch():
+        nonlocal parse_time, events, skipped
+        name = event_name if event_name is not None else b"message"
+        raw = data_lines[0] if len(data_lines) == 1 else b"\n".join(data_lines)
+        if raw == DONE_MARKER:  # Skip the [DONE] marker
+            return None
+        if (wanted is not None and name not in wanted) or (must_contain is not None and must_contain not in raw):
+            skipped += 1
+            return None
+        decode_start = time.perf_counter()
+        try:
+            data = _loads(raw)
+        except ValueError as e:
+            on_error(f"❌ Failed to parse SSE data: {str(e)} - Data: {raw.decode('utf-8', 'replace')}")
+            return None
+        finally:
+            parse_time += time.perf_counter() - decode_start
+        events += 1
+        return {"event": name.decode("utf-8"), "data": data}
+
+    try:
+        for line in lines:
+            line = _as_bytes(line).rstrip(b"\r\n")
+            if not line:
+                if data_lines:
+                    event = dispatch()
+                    if event is not None:
+                        yield event
+                event_name = None
+                data_lines = []
+                continue
+            if line[:1] == b":":  # comment / keepalive
+                continue
+            field, sep, value = line.partition(b":")
+            if sep and value[:1] == b" ":
+                value = value[1:]
+            if field == b"data":
+                data_lines.append(value)
+            elif field == b"event":
+                event_name = value.strip()
+        if data_lines:  # tolerate a body that does not end with a blank line
+            event = dispatch()
+            if event is not None:
+                yield event
+    finally:
+        tracing.record("sse_parse", parse_time, events=events, skipped=skipped)
+
+
+def parse_sse_response(response_text: Line, on_error: Callable[[str], None] = logger.error, **filters) -> List[Dict]:
+    """Parse a buffered SSE body into a list of events."""
+    return list(iter_sse_events(_as_bytes(response_text).splitlines(), on_error, **filters))
@@ -0,0 +1,8 @@
+"""The app is a set of top-level modules, and the benchmark stand-ins live in benchmarks/."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,11 @@
+from batch import stage_wall_times
+
+
+def test_overlapping_spans_count_once():
+    spans = [
+        {"name": "agent_http", "start_ms": 0.0, "duration_ms": 50.0},
+        {"name": "llm_summary", "start_ms": 60.0, "duration_ms": 100.0},
+        {"name": "llm_summary", "start_ms": 61.0, "duration_ms": 110.0},
+        {"name": "llm_summary", "start_ms": 62.0, "duration_ms": 100.0},
+    ]
+    assert stage_wall_times(spans) == {"agent_http": 50.0, "llm_summary": 111.0}
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from chart_data import OTHER_LABEL, lttb_indices, prepare_chart_data
+
+
+def test_lttb_keeps_endpoints_and_returns_sorted_unique_indices():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(500, dtype=float)
+    y = np.zeros(500)
+    y[321] = 100.0
+    assert 321 in lttb_indices(x, y, 20)
+
+
+def test_lttb_returns_every_index_when_under_threshold():
+    x = np.arange(10, dtype=float)
+    assert list(lttb_indices(x, x, 50)) == list(range(10))
+    assert list(lttb_indices(x, x, 2)) == list(range(10))
+
+
+def test_small_frames_are_charted_unchanged():
+    df = pd.DataFrame({"x": [1, 2, 3], "y": [3, 2, 1]})
+    chart = prepare_chart_data(df, "x", "y", "Line Chart", max_points=10, top_n=5, histogram_bins=4)
+    assert chart.df is df and chart.note is None
+
+
+def test_bar_charts_fold_the_tail_into_other():
+    df = pd.DataFrame({"county": [f"c{i}" for i in range(30)], "kwh": np.arange(30, dtype=float)})
+    chart = prepare_chart_data(df, "county", "kwh", "Bar Chart", max_points=10, top_n=3, histogram_bins=4)
+    assert list(chart.df["county"]) == ["c29", "c28", "c27", OTHER_LABEL]
+    assert chart.df["kwh"].sum() == df["kwh"].sum()
+
+
+def test_bar_charts_count_rows_when_y_is_not_numeric():
+    df = pd.DataFrame({"county": ["Napa"] * 5 + ["Marin"] * 3 + [f"c{i}" for i in range(30)],
+                       "program": ["retrofit"] * 38})
+    chart = prepare_chart_data(df, "county", "program", "Pie Chart", max_points=10, top_n=2, histogram_bins=4)
+    assert chart.binned
+    assert list(chart.df["county"]) == ["Napa", "Marin", OTHER_LABEL]
+    assert list(chart.df["count"]) == [5, 3, 30]
+    assert chart.note == "top 2 values by row count of 38 rows"
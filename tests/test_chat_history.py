@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+
+from chat_history import ChatHistory
+
+
+def results(n):
+    df = pd.DataFrame({"x": range(n)})
+    df.attrs.update(has_more=True, query_id=f"q{n}")
+    return df
+
+
+def test_older_results_spill_to_disk_and_load_back_with_attrs():
+    history = ChatHistory(max_messages=10, max_results_in_memory=1)
+    first = {"role": "assistant", "results": results(3)}
+    second = {"role": "assistant", "results": results(4)}
+    history.append(first)
+    history.append(second)
+    assert first["results"] is None and os.path.exists(first["results_path"])
+    loaded = history.load_results(first)
+    assert list(loaded["x"]) == [0, 1, 2]
+    assert loaded.attrs == {"has_more": True, "query_id": "q3"}
+    assert second["results"] is None  # loading the first one spilled the second
+
+
+def test_oldest_messages_are_dropped_with_their_files():
+    history = ChatHistory(max_messages=2, max_results_in_memory=0)
+    messages = [{"role": "assistant", "results": results(i + 1)} for i in range(3)]
+    for message in messages:
+        history.append(message)
+    assert len(history) == 2 and history[0] is messages[1]
+    assert "results_path" not in messages[0]
+
+
+def test_set_results_replaces_the_spilled_copy():
+    history = ChatHistory(max_messages=10, max_results_in_memory=1)
+    message = {"role": "assistant", "results": results(2)}
+    history.append(message)
+    history.append({"role": "assistant", "results": results(3)})
+    path = message["results_path"]
+    history.set_results(message, results(5))
+    assert not os.path.exists(path)
+    assert message.get("results_path") is None
+    assert len(history.load_results(message)) == 5
+
+
+def test_clear_removes_spilled_files():
+    history = ChatHistory(max_messages=10, max_results_in_memory=0)
+    message = {"role": "assistant", "results": results(2)}
+    history.append(message)
+    path = message["results_path"]
+    history.clear()
+    assert len(history) == 0 and not os.path.exists(path)
+
+
+def test_message_ids_survive_older_messages_being_dropped():
+    history = ChatHistory(max_messages=2)
+    history.append({"role": "user", "content": "first"})
+    second = {"role": "assistant", "content": "second", "id": "live-answer"}
+    history.append(second)
+    third = {"role": "user", "content": "third"}
+    history.append(third)
+    assert [m["id"] for m in history] == ["live-answer", third["id"]]
+    assert history[0] is second and len({m["id"] for m in history}) == 2
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pandas as pd
+
+import cortex_pipeline
+from cortex_pipeline import CortexPipeline, drain_in_background, drain_response, make_http_session
+from fake_snowflake import FakeSession
+from mock_cortex import DEFAULT_SQL, MockCortexServer
+from result_cache import TTLCache
+
+
+def make_pipeline(session, **kwargs):
+    errors = []
+    kwargs.setdefault("base_url", "http://unused")
+    pipeline = CortexPipeline(session, token_provider=lambda: "token", on_error=errors.append, **kwargs)
+    pipeline.page_size = 1000
+    return pipeline, errors
+
+
+def test_pages_come_from_a_single_execution():
+    session = FakeSession(rows=2500, query_latency=0)
+    pipeline, errors = make_pipeline(session)
+    pages = [pipeline.run_snowflake_query("SELECT * FROM t;")]
+    while pages[-1].attrs["has_more"]:
+        pages.append(pipeline.run_snowflake_query("SELECT * FROM t;", offset=sum(map(len, pages)),
+                                                  query_id=pages[-1].attrs["query_id"]))
+    assert [len(page) for page in pages] == [1000, 1000, 500]
+    pd.testing.assert_frame_equal(pd.concat(pages, ignore_index=True), session.result_frame)
+    assert session.queries == ["SELECT * FROM t"]
+    assert errors == []
+
+
+def test_cached_pages_are_not_shared_across_users_or_roles():
+    cache = TTLCache(60, 64 * 1024 * 1024)
+    alice, bob, alice_admin = FakeSession(query_latency=0), FakeSession(query_latency=0), FakeSession(query_latency=0)
+    bob.connection.user = "BOB"
+    alice_admin.connection.role = "ACCOUNTADMIN"
+    for session in (alice, alice, bob, alice_admin):
+        make_pipeline(session, result_cache=cache)[0].run_snowflake_query("SELECT 1")
+    assert [len(s.queries) for s in (alice, bob, alice_admin)] == [1, 1, 1]
+
+
+def test_cortex_calls_bind_parameters_on_the_server():
+    session = FakeSession(llm_latency=0)
+    pipeline, errors = make_pipeline(session)
+    assert pipeline.cortex_complete("it's 100% \"quoted\"?").startswith("Santa Clara")
+    assert errors == []
+
+    session.connection.paramstyle = "pyformat"  # what a connector connection defaults to
+    assert pipeline.cortex_complete("prompt") is None
+    assert "not all arguments converted" in errors[0]
+
+
+def test_timed_out_queries_are_cancelled():
+    session = FakeSession(query_latency=5)
+    pipeline, errors = make_pipeline(session)
+    pipeline.query_timeout = 0.1
+    assert pipeline.run_snowflake_query("SELECT 1") is None
+    assert session.cancelled == ["fake-00000001"]
+    assert "cancelled after running" in errors[0]
+
+
+def agent_pipeline(server):
+    return make_pipeline(FakeSession(query_latency=0), http=make_http_session(server.base_url),
+                         base_url=server.base_url)
+
+
+def test_stream_stops_at_tool_result_and_drained_connection_is_reused(monkeypatch):
+    monkeypatch.setattr(cortex_pipeline, "drain_in_background", drain_response)  # drain before returning
+    with MockCortexServer(first_byte_latency=0, event_delay=0, payload_kb=64) as server:
+        pipeline, errors = agent_pipeline(server)
+        assert pipeline.generate_sql("Total kWh savings by county?") == DEFAULT_SQL
+        assert pipeline.generate_sql("Which county saved the most?") == DEFAULT_SQL
+    assert errors == []
+    assert (server.requests, server.connections) == (2, 1)
+
+
+def test_drain_closes_a_slow_stream_at_its_deadline(monkeypatch):
+    drain_seconds = []
+
+    def timed_drain(response, remainder):
+        start = time.monotonic()
+        drain_response(response, remainder, timeout=0.2)
+        drain_seconds.append(time.monotonic() - start)
+
+    monkeypatch.setattr(cortex_pipeline, "drain_in_background", timed_drain)
+    # About 35 events follow the tool result, 50 ms apart: almost two seconds to read them all
+    with MockCortexServer(first_byte_latency=0, event_delay=0.05, payload_kb=24) as server:
+        pipeline, errors = agent_pipeline(server)
+        assert pipeline.generate_sql("Total kWh savings by county?") == DEFAULT_SQL
+        assert pipeline.generate_sql("Which county saved the most?") == DEFAULT_SQL
+    assert errors == []
+    assert all(seconds < 1 for seconds in drain_seconds) and len(drain_seconds) == 2
+    assert (server.requests, server.connections) == (2, 2)
+
+
+def test_background_drain_threads_do_not_block_exit():
+    class Response:
+        closed = threading.Event()
+
+        def close(self):
+            self.closed.set()
+
+    response = Response()
+    drain_in_background(response, iter([b"data: {}"]))
+    assert response.closed.wait(1)
+    assert all(t.daemon for t in threading.enumerate() if t.name.startswith("sse-drain"))
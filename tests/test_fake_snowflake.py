@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from fake_snowflake import BATCH_ROWS, FakeSession
+
+
+def test_qmark_parameters_bind_on_the_server():
+    session = FakeSession(llm_latency=0)
+    session.connection.paramstyle = "qmark"
+    cursor = session.connection.cursor()
+    assert cursor.execute("SELECT SNOWFLAKE.CORTEX.SUMMARIZE(?)", ["A. B"]).fetchone()[0].startswith("A.")
+
+
+@pytest.mark.parametrize("paramstyle", ["pyformat", "format"])
+def test_client_side_paramstyles_reject_question_marks(paramstyle):
+    session = FakeSession(llm_latency=0)
+    session.connection.paramstyle = paramstyle
+    with pytest.raises(TypeError, match="not all arguments converted"):
+        session.connection.cursor().execute("SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?)", ["model", "prompt"])
+
+
+def test_async_queries_run_for_their_latency_and_stream_batches():
+    session = FakeSession(rows=BATCH_ROWS * 2 + 1, query_latency=0.05)
+    connection = session.connection
+    cursor = connection.cursor()
+    query_id = cursor.execute_async("SELECT * FROM t")["queryId"]
+    assert connection.is_still_running(connection.get_query_status_throw_if_error(query_id))
+    time.sleep(0.06)
+    assert not connection.is_still_running(connection.get_query_status_throw_if_error(query_id))
+    cursor.get_results_from_sfqid(query_id)
+    assert [len(batch) for batch in cursor.fetch_pandas_batches()] == [BATCH_ROWS, BATCH_ROWS, 1]
+
+
+def test_aborted_queries_fail_their_status_check():
+    session = FakeSession(query_latency=5)
+    cursor = session.connection.cursor()
+    query_id = cursor.execute_async("SELECT 1")["queryId"]
+    assert cursor.abort_query(query_id)
+    with pytest.raises(RuntimeError):
+        session.connection.get_query_status_throw_if_error(query_id)
@@ -0,0 +1,47 @@
+import pytest
+
+from intent_router import COMPLETE, SEARCH, STRUCTURED, SUGGESTION, SUMMARIZE, IntentRouter, make_llm_fallback
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("Show total energy savings by county.", STRUCTURED),
+    ("How many active projects are there", STRUCTURED),
+    ("What is Green Residences program?", SEARCH),
+    ("Summarize the program brochure", SUMMARIZE),
+    ("Write a short note about heat pumps", COMPLETE),
+    ("What questions can I ask?", SUGGESTION),
+])
+def test_keyword_routing(question, intent):
+    assert IntentRouter().classify(question).intent == intent
+
+
+def test_ranking_follows_intent_priority_and_ends_with_search():
+    ranked = IntentRouter().rank("Explain the total kWh by county")
+    assert [match.intent for match in ranked] == [COMPLETE, STRUCTURED, SEARCH]
+    assert ranked[1].evidence == ("total", "kwh", "county")
+
+
+def test_fallback_only_decides_ambiguous_questions():
+    asked = []
+
+    def fallback(query, ranked):
+        asked.append(query)
+        return STRUCTURED
+
+    router = IntentRouter(fallback=fallback)
+    assert router.classify("Show total savings by county").intent == STRUCTURED
+    assert asked == []
+    match = router.classify("Tell me about the program")
+    assert match.intent == STRUCTURED and match.evidence[-1] == "fallback"
+    assert asked == ["Tell me about the program"]
+
+
+def test_unknown_fallback_answer_keeps_the_keyword_result():
+    router = IntentRouter(fallback=lambda query, ranked: "weather")
+    assert router.classify("Tell me about the program").intent == SEARCH
+
+
+def test_llm_fallback_picks_the_label_from_the_response():
+    fallback = make_llm_fallback(lambda prompt: "  Structured.\n")
+    assert fallback("q", []) == STRUCTURED
+    assert make_llm_fallback(lambda prompt: None)("q", []) is None
@@ -0,0 +1,51 @@
+from model_registry import ModelRegistry
+
+SPECS = [
+    {"name": "residences", "semantic_model_file": "@stage/residences.yaml", "search_service": "docs",
+     "keywords": ["kwh"]},
+    {"name": "leads", "semantic_model_file": "@stage/leads.yaml", "search_service": "leads_docs",
+     "keywords": ["lead"]},
+]
+YAML = {
+    "@stage/residences.yaml": "tables:\n  - name: projects\n    dimensions:\n      - name: county\n",
+    "@stage/leads.yaml": "tables:\n  - name: leads\n    measures:\n      - name: profit\n        synonyms: [margin]\n",
+}
+
+
+def test_versions_follow_the_semantic_model_text():
+    registry = ModelRegistry.from_config(SPECS, load_yaml=YAML.get)
+    edited = dict(YAML, **{"@stage/leads.yaml": YAML["@stage/leads.yaml"] + "      - name: revenue\n"})
+    reloaded = ModelRegistry.from_config(SPECS, load_yaml=edited.get)
+    assert registry.version("@stage/residences.yaml") == reloaded.version("@stage/residences.yaml") != ""
+    assert registry.version("@stage/leads.yaml") != reloaded.version("@stage/leads.yaml")
+    assert registry.version("@stage/unknown.yaml") == ""
+
+
+def test_unreadable_models_keep_their_keywords_and_have_no_version():
+    def load(path):
+        raise OSError("stage unavailable")
+
+    registry = ModelRegistry.from_config(SPECS, load_yaml=load)
+    assert registry.entries[1].terms == ("lead",)
+    assert registry.version("@stage/leads.yaml") == ""
+
+
+def test_rank_scores_terms_from_keywords_and_the_model():
+    registry = ModelRegistry.from_config(SPECS, load_yaml=YAML.get)
+    best, other = registry.rank("Which leads had the best margin in each county?")
+    assert best.entry.name == "leads" and best.evidence == ("leads", "margin")
+    assert other.entry.name == "residences" and other.evidence == ("county",)
+    assert registry.route("total kWh by county").entry.name == "residences"
+
+
+def test_shared_terms_split_their_weight_and_ties_go_to_the_earlier_model():
+    shared = [dict(spec, keywords=spec["keywords"] + ["program"]) for spec in SPECS]
+    registry = ModelRegistry.from_config(shared)
+    ranked = registry.rank("Programs with a lead")
+    assert [(m.entry.name, m.score) for m in ranked] == [("leads", 1.5), ("residences", 0.5)]
+    assert registry.route("program totals").entry.name == "residences"
+
+
+def test_unmatched_questions_go_to_the_default_model():
+    registry = ModelRegistry.from_config(SPECS)
+    assert registry.rank("hello there") == [(registry.default, 0.0, ())]
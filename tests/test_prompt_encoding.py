@@ -0,0 +1,45 @@
+import pandas as pd
+
+from prompt_encoding import encode_results, estimate_tokens, truncate_to_token_budget
+
+
+def frame(rows):
+    return pd.DataFrame({"COUNTY": [f"County {i % 7}" for i in range(rows)], "KWH": [i * 1.5 for i in range(rows)]})
+
+
+def test_small_results_are_sent_whole():
+    encoded = encode_results(frame(5), max_tokens=1000)
+    assert encoded.strategy == "full"
+    assert encoded.rows_included == encoded.total_rows == 5
+    assert encoded.text.startswith("COUNTY,KWH\n")
+
+
+def test_large_results_send_leading_rows_and_statistics_within_budget():
+    encoded = encode_results(frame(5000), max_tokens=500)
+    assert encoded.strategy == "head"
+    assert 0 < encoded.rows_included < 5000 and encoded.total_rows == 5000
+    assert estimate_tokens(encoded.text) <= 500
+    assert f"The first {encoded.rows_included} of 5000 rows" in encoded.text
+    assert "Summary statistics over all 5000 rows" in encoded.text
+
+
+def test_sample_strategy_labels_the_sample():
+    encoded = encode_results(frame(5000), max_tokens=500, strategy="sample")
+    assert encoded.strategy == "sample"
+    assert f"A random sample of {encoded.rows_included} of 5000 rows" in encoded.text
+
+
+def test_cut_off_results_say_so():
+    full = encode_results(frame(5), max_tokens=1000, has_more=True)
+    assert full.has_more and "the rest were cut off" in full.text
+    truncated = encode_results(frame(5000), max_tokens=500, has_more=True)
+    assert "Summary statistics over the first 5000 rows (the results were cut off)" in truncated.text
+    assert "over all" not in truncated.text
+
+
+def test_truncate_to_token_budget_cuts_at_line_boundaries():
+    text = "\n".join(f"line {i}" for i in range(200))
+    cut = truncate_to_token_budget(text, 50)
+    assert estimate_tokens(cut) <= 50
+    assert cut.endswith("more lines omitted)")
+    assert truncate_to_token_budget("short", 50) == "short"
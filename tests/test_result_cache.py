@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from result_cache import TTLCache
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(ttl=0.01, max_bytes=1024)
+    cache.set("k", "v")
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes():
+    cache = TTLCache(ttl=60, max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_get_or_compute_runs_once_for_concurrent_callers():
+    cache = TTLCache(ttl=60, max_bytes=1024)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+    assert cache.get("k") == "value"
+
+
+def test_none_is_shared_but_not_cached():
+    cache = TTLCache(ttl=60, max_bytes=1024)
+    assert cache.get_or_compute("k", lambda: None) is None
+    assert cache.get_or_compute("k", lambda: "later") == "later"
+
+
+def test_failed_compute_raises_and_is_retried():
+    cache = TTLCache(ttl=60, max_bytes=1024)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", fail)
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+
+def test_values_larger_than_the_cache_are_not_stored():
+    cache = TTLCache(ttl=60, max_bytes=4)
+    cache.set("small", "ab")
+    cache.set("big", "abcdefgh")
+    assert cache.get("big") is None and cache.get("small") == "ab"
+
+
+def test_hits_and_misses_are_counted():
+    cache = TTLCache(ttl=60, max_bytes=1024)
+    cache.set("k", "v")
+    cache.get("k")
+    cache.get("other")
+    assert cache.stats() == {"entries": 1, "bytes": 1, "hits": 1, "misses": 1}
@@ -0,0 +1,37 @@
+from search_answers import dedupe_passages, merge_summaries, rank_passages
+
+RATES = "The residential rebate for heat pump water heaters is 500 dollars per unit installed in Napa."
+
+
+def test_dedupe_drops_repeats_and_contained_passages():
+    longer = RATES + " Contractors must be enrolled in the program before installation."
+    passages = [RATES, "", "   ", longer, "Solar panels are not covered by this program."]
+    assert dedupe_passages(passages) == [RATES, "Solar panels are not covered by this program."]
+
+
+def test_dedupe_keeps_the_earlier_passage():
+    reworded = "The residential rebate for heat pump water heaters is 500 dollars per unit installed in Marin."
+    assert dedupe_passages([reworded, RATES], threshold=0.8) == [reworded]
+    assert dedupe_passages([reworded, RATES], threshold=1.0) == [reworded, RATES]
+
+
+def test_rank_moves_covering_passages_up():
+    passages = ["Office hours are 9 to 5.", "Lighting upgrades qualify for a small credit.", RATES]
+    ranked = rank_passages("What is the rebate for a heat pump water heater?", passages)
+    assert ranked[0] == RATES
+    assert sorted(ranked) == sorted(passages)
+
+
+def test_rank_keeps_service_order_without_content_words():
+    passages = ["first", "second", "third"]
+    assert rank_passages("what is it?", passages) == passages
+
+
+def test_merge_drops_repeated_sentences():
+    merged = merge_summaries([
+        "Rebates are 500 dollars. Installers must enroll first.",
+        None,
+        "rebates are 500 dollars! Applications close in June.",
+    ])
+    assert merged == "Rebates are 500 dollars. Installers must enroll first. Applications close in June."
+    assert merge_summaries([None, ""]) is None
@@ -0,0 +1,79 @@
+import os
+import stat
+
+import pandas as pd
+import pytest
+
+from result_cache import TTLCache
+from shared_cache import SharedCache, SQLiteBackend, dumps, loads, make_backend
+
+
+def make_cache(backend, namespace="results"):
+    return SharedCache(backend, namespace, ttl=60, local=TTLCache(60, 1024 * 1024), version="v1",
+                       generation_check_interval=0)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "cache" / "cache.sqlite3"), max_bytes=1024 * 1024)
+
+
+def test_values_round_trip():
+    df = pd.DataFrame({"COUNTY": ["Napa", "Marin"], "KWH": [1.5, 2.0]})
+    df.attrs.update(has_more=True, query_id="01ab")
+    restored = loads(dumps(df))
+    pd.testing.assert_frame_equal(restored, df)
+    assert restored.attrs == {"has_more": True, "query_id": "01ab"}
+    assert loads(dumps("text")) == "text"
+    assert loads(dumps({"a": [1, 2]})) == {"a": [1, 2]}
+
+
+def test_database_is_private_to_its_owner(backend):
+    assert stat.S_IMODE(os.stat(backend.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(backend.path)).st_mode) == 0o700
+
+
+def test_entries_are_shared_between_processes(backend):
+    writer, reader = make_cache(backend), make_cache(backend)
+    writer.set(("sql", 0), "rows")
+    assert reader.get(("sql", 0)) == "rows"
+    assert reader.get_or_compute(("sql", 0), lambda: pytest.fail("should be a shared hit")) == "rows"
+
+
+def test_clear_purges_the_namespace_for_every_process(backend):
+    first, second = make_cache(backend), make_cache(backend)
+    other = make_cache(backend, namespace="sql")
+    first.set("k", "v")
+    other.set("k", "kept")
+    assert second.get("k") == "v"
+    assert first.clear() == 1
+    assert second.get("k") is None
+    assert other.get("k") == "kept"
+
+
+def test_backend_errors_are_misses():
+    class Broken:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise OSError("store down")
+            return fail
+
+    cache = make_cache(Broken())
+    assert cache.get("k") is None
+    assert cache.get_or_compute("k", lambda: "computed") == "computed"
+    assert cache.get("k") == "computed"  # still cached in process
+
+
+def test_oldest_entries_are_evicted_past_max_bytes(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=25, evict_every=1)
+    for key in "abc":
+        backend.set(key, b"x" * 10, ttl=60)
+    assert backend.get("a") is None
+    assert backend.get("b") == b"x" * 10 and backend.get("c") == b"x" * 10
+
+
+def test_a_store_that_cannot_be_opened_falls_back_to_process_local_caching():
+    assert make_backend("sqlite", "/proc/nope/cache.sqlite3", 1024, "") is None
+    assert make_backend("memory", "", 0, "") is None
+    with pytest.raises(ValueError):
+        make_backend("memcached", "", 0, "")
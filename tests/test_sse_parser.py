@@ -0,0 +1,40 @@
+from sse_parser import iter_sse_events, parse_sse_response
+
+BODY = (
+    b": keepalive\r\n"
+    b"event: message.delta\r\n"
+    b'data: {"a": 1,\r\n'
+    b'data:  "b": 2}\r\n'
+    b"\r\n"
+    b"event: done\n"
+    b"data: [DONE]\n"
+    b"\n"
+    b'data: {"tool_results": true}'
+)
+
+
+def test_parses_multiline_data_comments_crlf_and_unterminated_last_event():
+    events = parse_sse_response(BODY)
+    assert events == [
+        {"event": "message.delta", "data": {"a": 1, "b": 2}},
+        {"event": "message", "data": {"tool_results": True}},
+    ]
+
+
+def test_str_and_bytes_input_parse_the_same():
+    assert parse_sse_response(BODY.decode("utf-8")) == parse_sse_response(BODY)
+
+
+def test_filtered_events_are_not_decoded():
+    errors = []
+    lines = [b"event: message.delta", b"data: {not json", b"", b"event: other", b'data: {"tool_results": 1}', b""]
+    events = list(iter_sse_events(lines, errors.append, event_types=("message.delta",), must_contain=b'"tool_results"'))
+    assert events == []
+    assert errors == []
+
+
+def test_invalid_json_is_reported_and_skipped():
+    errors = []
+    events = parse_sse_response(b"data: {oops\n\ndata: {}\n\n", errors.append)
+    assert events == [{"event": "message", "data": {}}]
+    assert len(errors) == 1 and "Failed to parse SSE data" in errors[0]
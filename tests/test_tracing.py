@@ -0,0 +1,50 @@
+import json
+import os
+import stat
+
+from tracing import Tracer, _percentile, span
+
+
+def test_percentiles_per_stage():
+    tracer = Tracer()
+    for ms in range(1, 101):
+        tracer.submit({"total_ms": float(ms), "spans": [{"name": "sql", "duration_ms": float(ms)}]})
+    stats = tracer.percentiles()
+    assert stats["sql"] == {"count": 100, "p50": 51.0, "p95": 95.0}
+    assert stats["total"]["count"] == 100
+
+
+def test_percentiles_use_recent_window():
+    tracer = Tracer(window=3)
+    for ms in (1000.0, 1.0, 2.0, 3.0):
+        tracer.submit({"total_ms": ms, "spans": []})
+    assert tracer.percentiles()["total"] == {"count": 3, "p50": 2.0, "p95": 3.0}
+    assert _percentile([7.0], 95) == 7.0
+
+
+def test_trace_records_spans():
+    tracer = Tracer()
+    with tracer.start_trace("how many?").activate():
+        with span("sql", rows=3):
+            pass
+    assert set(tracer.percentiles()) == {"sql", "total"}
+
+
+def test_log_is_private(tmp_path):
+    path = tmp_path / "traces" / "traces.jsonl"
+    tracer = Tracer(str(path))
+    with tracer.start_trace("who used the most power?").activate():
+        pass
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+    assert json.loads(path.read_text())["question"] == "who used the most power?"
+
+
+def test_log_rolls_over_at_size_cap(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(path), max_bytes=200)
+    for i in range(20):
+        tracer.submit({"question": f"q{i}", "total_ms": 1.0, "spans": []})
+    assert os.path.getsize(path) < 200 + 100
+    assert os.path.getsize(str(path) + ".1") < 200 + 100
+    assert json.loads(path.read_text().splitlines()[-1])["question"] == "q19"
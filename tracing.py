@@ -0,0 +1,145 @@
+"""Per-question latency spans, written as JSON lines and summarized as p50/p95 per stage."""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while answering one question."""
+
+    def __init__(self, tracer: "Tracer", question: str):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex
+        self.question = question
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self) -> Iterator["Trace"]:
+        """Make this the current trace for span()/record(), finishing it on exit."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+            self.finish()
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time a block. The yielded dict can be filled with attributes known only inside it."""
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record(name, time.perf_counter() - start, start=start, **attrs)
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs: Any) -> None:
+        """Add a span measured elsewhere; `duration` and `start` are perf_counter seconds."""
+        start = start if start is not None else time.perf_counter() - duration
+        span = {
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 2),
+            "duration_ms": round(duration * 1000, 2),
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self) -> None:
+        with self._lock:
+            record = {
+                "trace_id": self.trace_id,
+                "question": self.question,
+                "started_at": self.started_at,
+                "total_ms": round((time.perf_counter() - self._start) * 1000, 2),
+                "spans": list(self.spans),
+            }
+        self.tracer.submit(record)
+
+
+class Tracer:
+    """Collects finished traces: appends them to a JSON lines log and keeps recent durations per stage.
+
+    The log holds question text, so it is created owner-only (0600, directory 0700). Once it reaches
+    `max_bytes` it is renamed to `<log_path>.1`, replacing the previous one, so at most two files are kept.
+    """
+
+    def __init__(self, log_path: Optional[str] = None, window: int = 500, max_bytes: int = 50 * 1024 * 1024):
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def start_trace(self, question: str) -> Trace:
+        return Trace(self, question)
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            for span in record["spans"]:
+                self._durations[span["name"]].append(span["duration_ms"])
+            self._durations["total"].append(record["total_ms"])
+            if self.log_path:
+                try:
+                    self._write(json.dumps(record, default=str) + "\n")
+                except OSError:
+                    pass  # Tracing must never break answering
+
+    def _write(self, line: str) -> None:
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        try:
+            if os.path.getsize(self.log_path) >= self.max_bytes:
+                os.replace(self.log_path, self.log_path + ".1")
+        except FileNotFoundError:
+            pass
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        os.fchmod(fd, 0o600)  # also tightens a log left behind by an older version
+        with os.fdopen(fd, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """count, p50 and p95 in milliseconds for each stage seen in the window."""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._durations.items() if values}
+        return {
+            name: {"count": len(values), "p50": _percentile(values, 50), "p95": _percentile(values, 95)}
+            for name, values in snapshot.items()
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Time a block as part of the current trace; a no-op outside of one."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    with trace.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def record(name: str, duration: float, **attrs: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(name, duration, **attrs)